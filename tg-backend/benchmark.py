@@ -0,0 +1,190 @@
+"""Offline benchmark of the get_alpha -> validation_layer -> trust_layer pipeline
+
+LLM calls are served from recorded fixtures (LLM_BACKEND=replay), so no Groq
+key or network is needed. Balance checks, trades and Mongo logging are skipped.
+Runs with the same --seed and --concurrency 1 produce the same actions. Tweet
+sentiment targets follow the alpha's sentiment instead of being random, so the
+batched validation prompts are known in advance; with more concurrency, a
+batch that was not recorded falls back to the per-token fixtures.
+
+    python benchmark.py seed                      # fixtures from sample_response.json
+    python benchmark.py run --repeat 20 --concurrency 8
+
+Real traffic can be captured instead by running the app with LLM_BACKEND=record.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from collections import Counter
+
+from cryptography.fernet import Fernet
+
+# Must be set before tele/llm read their configuration
+os.environ.setdefault("LLM_BACKEND", "replay")
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+
+import llm  # noqa: E402
+import tele  # noqa: E402
+
+# Recorded completions look like the model's: a reasoning block, then the payload
+THINK_PREFIX = "<think>\n</think>\n"
+
+
+def benchmark_target(token: dict) -> str:
+    """Deterministic stand-in for tele.tweet_sentiment_target: its most likely outcome"""
+    return "good" if token["sentiment"] == "positive" else "bad"
+
+
+def load_logs(path: str) -> list:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def seed(args):
+    """Rebuild the prompts behind the logged actions and store the logged outputs as fixtures"""
+    logs = load_logs(args.logs)
+    if os.path.exists(args.fixtures):
+        os.remove(args.fixtures)
+    store = llm.FixtureStore(args.fixtures)
+
+    def add(prompt, payload, call_site):
+        output = THINK_PREFIX + json.dumps(payload)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(output) // 4, "latency": 0.0}
+        store.record(prompt, output, usage, call_site)
+
+    # Alpha -> (tweets, sentiment) from the logged validation steps
+    tweets_by_alpha = {}
+    sentiments = {}
+    for log in logs:
+        if log["action"] == "Get Tweets":
+            tweets_by_alpha[json.dumps(log["input"], sort_keys=True)] = log["output"]
+        elif log["action"] == "Analyse Tweets":
+            sentiments[(log["input"]["token"], json.dumps(log["input"]["tweets"]))] = log["output"]
+
+    def validation_for(alpha):
+        tweets = tweets_by_alpha.get(json.dumps(alpha, sort_keys=True))
+        if tweets is None:
+            return None
+        sentiment = sentiments.get((alpha["token"], json.dumps(tweets)))
+        return (tweets, sentiment) if sentiment else None
+
+    windows = 0
+    # Tokens the per-token cache holds by the time a window is analysed, replaying in log order
+    cached = set()
+    for log in logs:
+        if log["action"] != "Get Alpha from Group Texts":
+            continue
+        queue, alphas = log["input"], log["output"]
+        candidates = None
+        if tele.TICKER_PREFILTER:
+            candidates = tele.ticker_matcher.find_all(message["message_text"] for message in queue)
+            if not candidates:
+                continue
+        add(tele.build_alpha_prompt(queue, candidates), alphas, "get_alpha")
+        windows += 1
+
+        validations = {}
+        for alpha in alphas:
+            validation = validation_for(alpha)
+            if validation is None:
+                continue
+            tweets, sentiment = validation
+            validations[alpha["token"]] = validation
+            add(tele.build_tweets_prompt(alpha["token"], benchmark_target(alpha)), {"tweets": tweets}, "get_tweets")
+            add(tele.build_tweet_analysis_prompt(tweets, alpha["token"]), {"sentiment": sentiment}, "analyse_tweets")
+
+        # Only tokens missing from the per-token cache are batched, sorted as tele does
+        targets = {alpha["token"].upper(): alpha for alpha in alphas}
+        misses = sorted(token for token in targets if token not in cached)
+        if len(alphas) > 1 and len(misses) > 1:
+            entries = [
+                {"token": token, "tweets": tweets, "sentiment": sentiment}
+                for token, (tweets, sentiment) in validations.items()
+            ]
+            prompt = tele.build_validation_batch_prompt(
+                [(targets[token]["token"], benchmark_target(targets[token])) for token in misses]
+            )
+            add(prompt, {"tokens": entries}, "validate_batch")
+        cached.update(token.upper() for token in validations)
+
+    print(f"Recorded {store.recorded} fixtures from {windows} windows into {args.fixtures}")
+
+
+async def run(args):
+    if llm.LLM_BACKEND != "replay":
+        print(f"Warning: LLM_BACKEND is {llm.LLM_BACKEND}, calls will go to Groq")
+
+    windows = [log["input"] for log in load_logs(args.logs) if log["action"] == "Get Alpha from Group Texts"]
+    windows = windows * args.repeat
+    actions = Counter()
+
+    async def log_action(action, input_data, output_data, user_id):
+        actions[action] += 1
+
+    async def check_alpha_balance(token, user_id):
+        return True
+
+    async def transaction_layer(token, user_id):
+        actions["Transaction (skipped)"] += 1
+
+    tele.log_action = log_action
+    tele.check_alpha_balance = check_alpha_balance
+    tele.transaction_layer = transaction_layer
+    tele.tweet_sentiment_target = benchmark_target
+
+    user_ids = [f"benchmark-{index}" for index in range(args.users)]
+    random.seed(args.seed)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def run_window(queue):
+        async with semaphore:
+            started = time.monotonic()
+            await tele.analyse_texts(queue, user_ids)
+            latencies.append(time.monotonic() - started)
+
+    started = time.monotonic()
+    await asyncio.gather(*[run_window(queue) for queue in windows])
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    report = {
+        "windows": len(windows),
+        "seconds": round(elapsed, 3),
+        "windows_per_second": round(len(windows) / elapsed, 2) if elapsed else None,
+        "window_latency_p50": round(statistics.median(latencies), 3) if latencies else None,
+        "window_latency_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+        "actions": dict(sorted(actions.items())),
+        "llm_usage": llm.usage_stats,
+        "llm_cache": llm.cache_stats(),
+        "llm_extraction": llm.extraction_stats,
+        "llm_backend": llm.fixture_stats(),
+        "prefilter": tele.prefilter_stats,
+    }
+    print(json.dumps(report, indent=2))
+    await llm.close_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["seed", "run"], nargs="?", default="run")
+    parser.add_argument("--logs", default="sample_response.json", help="exported logs collection")
+    parser.add_argument("--fixtures", default=llm.LLM_FIXTURES_PATH, help="seed output; run reads LLM_FIXTURES_PATH")
+    parser.add_argument("--repeat", type=int, default=10, help="times to replay each logged window")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--users", type=int, default=1, help="users subscribed to every window")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        seed(args)
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import hashlib
+import random
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _hash64(data: str) -> int:
+    return int.from_bytes(hashlib.blake2b(data.encode(), digest_size=8).digest(), "big")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text.lower()).strip()
+
+
+class _Horizon:
+    """Recent messages of one key: exact hashes plus MinHash signatures bucketed by LSH band"""
+
+    __slots__ = ("entries", "exact", "buckets", "next_id")
+
+    def __init__(self):
+        self.entries: deque = deque()
+        self.exact: Dict[int, int] = {}
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], set] = {}
+        self.next_id = 0
+
+
+class MessageDeduplicator:
+    """Suppress exact and near-duplicate messages within a sliding horizon per key
+
+    Exact duplicates are caught by hashing the normalized text. Near duplicates
+    (reposted shills with a changed emoji or link) are caught with MinHash over
+    character shingles, using LSH banding to find candidates and an estimated
+    Jaccard similarity of at least `threshold` to confirm them.
+    """
+
+    def __init__(
+        self,
+        horizon: int = 200,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5,
+        min_length: int = 20,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.horizon = horizon
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_length = min_length
+
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self._horizons: Dict[str, _Horizon] = {}
+        self.stats_by_key: Dict[str, Dict[str, int]] = {}
+
+    def is_duplicate(self, key: str, text: Optional[str]) -> bool:
+        """Return True if `text` repeats a recent message under `key`, otherwise remember it"""
+        if not text:
+            return False
+
+        normalized = normalize_text(text)
+        horizon = self._horizons.get(key)
+        if horizon is None:
+            horizon = self._horizons[key] = _Horizon()
+        stats = self.stats_by_key.setdefault(key, {"seen": 0, "exact": 0, "near": 0})
+        stats["seen"] += 1
+
+        exact_hash = _hash64(normalized)
+        if exact_hash in horizon.exact:
+            stats["exact"] += 1
+            return True
+
+        signature = None
+        if len(normalized) >= self.min_length:
+            signature = self._signature(normalized)
+            if self._has_near_duplicate(horizon, signature):
+                stats["near"] += 1
+                return True
+
+        self._remember(horizon, exact_hash, signature)
+        return False
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return self.stats_by_key
+
+    def _signature(self, normalized: str) -> List[int]:
+        size = self.shingle_size
+        shingles = {
+            _hash64(normalized[i:i + size])
+            for i in range(max(1, len(normalized) - size + 1))
+        }
+        return [
+            min(((a * shingle + b) % _MERSENNE_PRIME) & _MAX_HASH for shingle in shingles)
+            for a, b in self._perms
+        ]
+
+    def _bands(self, signature: List[int]):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield (band, tuple(signature[start:start + self.rows]))
+
+    def _has_near_duplicate(self, horizon: _Horizon, signature: List[int]) -> bool:
+        candidates = set()
+        for band in self._bands(signature):
+            candidates.update(horizon.buckets.get(band, ()))
+        if not candidates:
+            return False
+
+        signatures = {entry[0]: entry[2] for entry in horizon.entries if entry[0] in candidates}
+        for other in signatures.values():
+            matches = sum(1 for x, y in zip(signature, other) if x == y)
+            if matches / self.num_perm >= self.threshold:
+                return True
+        return False
+
+    def _remember(self, horizon: _Horizon, exact_hash: int, signature: Optional[List[int]]):
+        entry_id = horizon.next_id
+        horizon.next_id += 1
+        horizon.entries.append((entry_id, exact_hash, signature))
+        horizon.exact[exact_hash] = entry_id
+        if signature is not None:
+            for band in self._bands(signature):
+                horizon.buckets.setdefault(band, set()).add(entry_id)
+
+        while len(horizon.entries) > self.horizon:
+            old_id, old_hash, old_signature = horizon.entries.popleft()
+            if horizon.exact.get(old_hash) == old_id:
+                del horizon.exact[old_hash]
+            if old_signature is not None:
+                for band in self._bands(old_signature):
+                    bucket = horizon.buckets.get(band)
+                    if bucket is not None:
+                        bucket.discard(old_id)
+                        if not bucket:
+                            del horizon.buckets[band]
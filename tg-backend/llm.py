@@ -0,0 +1,675 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from groq import APIConnectionError, APIStatusError, AsyncGroq, RateLimitError
+from pydantic import TypeAdapter
+from pydantic_core import from_json
+
+from cache import TTLCache
+from scheduler import RateLimiter
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 30))
+# Longest rate limit reset worth waiting for; a 429 with a later reset fails the call
+LLM_RETRY_HINT_MAX = float(os.getenv("LLM_RETRY_HINT_MAX", 60))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 1024))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+LLM_CACHE_DISK_SIZE = int(os.getenv("LLM_CACHE_DISK_SIZE", 10000))
+# Account-wide Groq limits; 0 disables the corresponding bucket
+LLM_RPM = float(os.getenv("LLM_RPM", 30))
+LLM_TPM = float(os.getenv("LLM_TPM", 6000))
+# Completion tokens reserved per call until the real count is known
+LLM_COMPLETION_ESTIMATE = int(os.getenv("LLM_COMPLETION_ESTIMATE", 512))
+# "groq" calls the API, "replay" serves recorded responses, "record" calls the API and saves them
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_FIXTURES_PATH = os.getenv("LLM_FIXTURES_PATH", "llm_fixtures.jsonl")
+# Synthetic replay latency: a fixed cost per call plus a cost per completion token
+LLM_REPLAY_LATENCY = float(os.getenv("LLM_REPLAY_LATENCY", 0.5))
+LLM_REPLAY_TOKEN_SECONDS = float(os.getenv("LLM_REPLAY_TOKEN_SECONDS", 0.002))
+
+# Headers Groq sends on a 429, in order of preference. x-ratelimit-reset-requests is left
+# out: it tracks the requests-per-day window, which is usually far from the limit hit
+RATE_LIMIT_HEADERS = ("retry-after", "x-ratelimit-reset-tokens")
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+_JSON_DECODER = json.JSONDecoder()
+
+_client: AsyncGroq = None
+
+
+class LLMCache:
+    """Completion cache keyed by content hash: an in-memory LRU, optionally backed by SQLite
+
+    Disk reads and writes run in a worker thread, off the event loop. The table
+    holds at most `disk_maxsize` rows; expired rows go first, then the ones
+    closest to expiring.
+    """
+
+    def __init__(self, maxsize: int = 1024, path: str = None, disk_maxsize: int = 10000):
+        self.memory = TTLCache(maxsize)
+        self.disk_maxsize = disk_maxsize
+        self.disk_hits = 0
+        self._db = None
+        # One statement at a time on the shared connection
+        self._lock = asyncio.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires_at ON llm_cache (expires_at)")
+            self._evict()
+            self._db.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None or self._db is None:
+            return value
+
+        async with self._lock:
+            row = await asyncio.to_thread(self._read, key)
+        if row is None:
+            return None
+        self.disk_hits += 1
+        # Promote into memory for the rest of its lifetime
+        self.memory.set(key, row[0], ttl=row[1] - time.time())
+        return row[0]
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self.memory.set(key, value, ttl=ttl)
+        if self._db is not None:
+            async with self._lock:
+                await asyncio.to_thread(self._write, key, value, time.time() + ttl)
+
+    def _read(self, key: str) -> Optional[tuple]:
+        return self._db.execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+
+    def _write(self, key: str, value: str, expires_at: float) -> None:
+        self._db.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)", (key, value, expires_at))
+        self._evict()
+        self._db.commit()
+
+    def _evict(self) -> None:
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+        self._db.execute(
+            """DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY expires_at
+                LIMIT max(0, (SELECT COUNT(*) FROM llm_cache) - ?)
+            )""",
+            (self.disk_maxsize,),
+        )
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        lookups = stats["hits"] + stats["misses"]
+        stats["disk_hits"] = self.disk_hits
+        stats["hit_rate"] = (stats["hits"] + self.disk_hits) / lookups if lookups else 0.0
+        return stats
+
+
+class FixtureStore:
+    """Recorded completions keyed by prompt hash, stored as one JSON object per line
+
+    Each line is {"key", "call_site", "output", "usage"}; `output` is the raw
+    completion including any reasoning block. Later lines win on replay.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.responses: Dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.responses[record["key"]] = record
+
+    def get(self, prompt: str) -> dict:
+        record = self.responses.get(prompt_hash(prompt))
+        if record is None:
+            self.misses += 1
+            raise KeyError(f"No recorded response for prompt {prompt_hash(prompt)[:12]}")
+        self.hits += 1
+        return record
+
+    def record(self, prompt: str, output: str, usage: Dict[str, Any], call_site: str) -> None:
+        record = {
+            "key": prompt_hash(prompt),
+            "call_site": call_site,
+            "output": output,
+            "usage": {key: usage[key] for key in ("prompt_tokens", "completion_tokens", "latency")},
+        }
+        self.responses[record["key"]] = record
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        self.recorded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": LLM_BACKEND,
+            "fixtures": len(self.responses),
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded,
+        }
+
+
+response_cache = LLMCache(LLM_CACHE_SIZE, LLM_CACHE_PATH, LLM_CACHE_DISK_SIZE)
+fixtures = FixtureStore(LLM_FIXTURES_PATH) if LLM_BACKEND in ("replay", "record") else None
+# cache key -> in-flight completion, so identical concurrent prompts share one call
+_inflight: Dict[str, asyncio.Future] = {}
+# call site -> running totals of calls, tokens and latency
+usage_stats: Dict[str, Dict[str, float]] = {}
+# Shared by every call and retry in the process
+rate_limiter = RateLimiter(LLM_RPM, LLM_TPM)
+# Completions parsed, those that only parsed thanks to tolerant extraction, and those retried
+extraction_stats = {"parsed": 0, "retries_avoided": 0, "malformed": 0}
+# schema -> its pydantic TypeAdapter, built once
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def get_client() -> AsyncGroq:
+    """The process-wide Groq client; its HTTP connection pool is reused by every call"""
+    global _client
+    if _client is None:
+        # Retries are handled here so they can honour rate-limit headers
+        _client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+    response_cache.close()
+
+
+def cache_key(model: str, prompt: str) -> str:
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(f"{model}\n{normalized}".encode()).hexdigest()
+
+
+def prompt_hash(prompt: str) -> str:
+    """Model-independent key of a prompt, so fixtures survive a GROQ_MODEL change"""
+    return hashlib.sha256(" ".join(prompt.split()).encode()).hexdigest()
+
+
+async def cached_output(prompt: str, schema: Any = None, call_site: str = "generate") -> Any:
+    """What generate would return for a cached prompt, or None without calling the model"""
+    text = await response_cache.get(cache_key(os.getenv("GROQ_MODEL"), prompt))
+    if text is None:
+        return None
+    record_usage(call_site, {"prompt_tokens": 0, "completion_tokens": 0, "latency": 0.0, "cached": True})
+    return text if schema is None else parse_json(text, schema)
+
+
+async def cache_output(prompt: str, output: Any, cache_ttl: float) -> None:
+    """Cache output produced elsewhere (e.g. by a batched call) as the completion of `prompt`"""
+    text = output if isinstance(output, str) else json.dumps(output)
+    await response_cache.set(cache_key(os.getenv("GROQ_MODEL"), prompt), text, cache_ttl)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return response_cache.stats()
+
+
+def rate_limit_stats() -> Dict[str, Any]:
+    return rate_limiter.stats()
+
+
+def strip_reasoning(output: str) -> str:
+    """A completion without its <think>...</think> reasoning block, if it has one"""
+    end = output.rfind("</think>")
+    if end != -1:
+        return output[end + len("</think>"):]
+    if output.lstrip().startswith("<think>"):
+        raise ValueError("Reasoning block is never closed")
+    return output
+
+
+def extract_json(text: str) -> str:
+    """The JSON payload of a completion, ignoring code fences and any prose around it"""
+    text = text.strip()
+    fence = _CODE_FENCE.search(text)
+    if fence:
+        text = fence.group(1)
+    starts = [index for index, char in enumerate(text) if char in "[{"]
+    if not starts:
+        raise ValueError("No JSON in completion")
+    # The first bracket that opens a complete value, whatever follows it
+    for start in starts:
+        try:
+            _, end = _JSON_DECODER.raw_decode(text, start)
+        except ValueError:
+            continue
+        return text[start:end]
+    # A payload cut off mid-way is left to the partial parser
+    return text[starts[0]:]
+
+
+def parse_json(text: str, schema: Any) -> Any:
+    """Parse a completion's JSON and validate it against `schema`, returning plain dicts and lists"""
+    data = from_json(extract_json(text), allow_inf_nan=True, allow_partial=True)
+    adapter = get_adapter(schema)
+    return adapter.dump_python(adapter.validate_python(data))
+
+
+def get_adapter(schema: Any) -> TypeAdapter:
+    adapter = _adapters.get(schema)
+    if adapter is None:
+        adapter = _adapters[schema] = TypeAdapter(schema)
+    return adapter
+
+
+def fixture_stats() -> Dict[str, Any]:
+    return fixtures.stats() if fixtures else {"backend": LLM_BACKEND}
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough token count of a call: ~4 characters per prompt token plus a completion allowance"""
+    return len(prompt) // 4 + LLM_COMPLETION_ESTIMATE
+
+
+def record_usage(call_site: str, usage: Dict[str, Any]) -> None:
+    stats = usage_stats.setdefault(
+        call_site,
+        {"calls": 0, "cached": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency": 0.0},
+    )
+    if usage.get("cached"):
+        stats["cached"] += 1
+        return
+    stats["calls"] += 1
+    stats["prompt_tokens"] += usage["prompt_tokens"]
+    stats["completion_tokens"] += usage["completion_tokens"]
+    stats["latency"] += usage["latency"]
+    logger.info(
+        f"LLM call [{call_site}]: {usage['prompt_tokens']} prompt + "
+        f"{usage['completion_tokens']} completion tokens in {usage['latency']:.2f}s"
+    )
+
+
+def parse_duration(value: str) -> float:
+    """Parse a rate-limit reset value such as "1.5", "7.66s", "2m59.56s" or "120ms" into seconds"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    seconds = 0.0
+    for amount, unit in _DURATION_PART.findall(value or ""):
+        amount = float(amount)
+        seconds += {"ms": amount / 1000, "s": amount, "m": amount * 60, "h": amount * 3600}[unit]
+    return seconds
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (RateLimitError, APIConnectionError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code >= 500
+    # Completions that no extraction could parse, or that fail their schema (ValidationError
+    # is a ValueError), are worth another attempt
+    return isinstance(exc, ValueError)
+
+
+def retry_delay(attempt: int, exc: Exception = None) -> float:
+    """Exponential backoff with full jitter; after a 429, never shorter than the server's reset hint
+
+    A reset further away than LLM_RETRY_HINT_MAX raises instead of sleeping that long.
+    """
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+    if not isinstance(exc, RateLimitError):
+        return delay
+
+    for header in RATE_LIMIT_HEADERS:
+        value = exc.response.headers.get(header)
+        if value:
+            hint = parse_duration(value)
+            if hint > LLM_RETRY_HINT_MAX:
+                rate_limiter.pause(LLM_RETRY_HINT_MAX)
+                raise Exception(f"Rate limit resets in {hint:.0f}s, not retrying: {str(exc)}") from exc
+            delay = max(delay, hint)
+            break
+    # Hold back every other caller too, not just this retry
+    rate_limiter.pause(delay)
+    return delay
+
+
+async def generate(
+    prompt: str, cache_ttl: float = None, call_site: str = "generate", schema: Any = None
+) -> Any:
+    """Complete a prompt; with `cache_ttl` (seconds) the output is reused for identical prompts
+
+    With a `schema` (a pydantic model or type such as List[Model]) the JSON in
+    the completion is returned validated, and only output that cannot be
+    parsed or fails validation is retried.
+    """
+    output, _ = await generate_with_usage(prompt, cache_ttl, call_site, schema)
+    return output
+
+
+async def generate_with_usage(
+    prompt: str, cache_ttl: float = None, call_site: str = "generate", schema: Any = None
+) -> Tuple[Any, Dict[str, Any]]:
+    """Like generate, also returning the call's token counts and latency"""
+    model = os.getenv("GROQ_MODEL")
+    if not cache_ttl:
+        _, result, usage = await _generate(prompt, model, call_site, schema)
+        record_usage(call_site, usage)
+        return result, usage
+
+    key = cache_key(model, prompt)
+    cached = await response_cache.get(key)
+    if cached is not None:
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "latency": 0.0, "cached": True}
+        record_usage(call_site, usage)
+        return (cached if schema is None else parse_json(cached, schema)), usage
+
+    if key in _inflight:
+        result, usage = await asyncio.shield(_inflight[key])
+        return result, {**usage, "cached": True}
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        text, result, usage = await _generate(prompt, model, call_site, schema)
+        record_usage(call_site, usage)
+        # Only output that parsed is cached
+        await response_cache.set(key, text, cache_ttl)
+        future.set_result((result, usage))
+        return result, usage
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Waiters get the error; nobody else needs to retrieve it
+        future.exception()
+        raise
+    finally:
+        del _inflight[key]
+
+
+async def _generate(
+    prompt: str, model: str, call_site: str, schema: Any = None
+) -> Tuple[str, Any, Dict[str, Any]]:
+    """Completion text without reasoning, its parsed form (the text itself without a schema), and usage"""
+    started = time.monotonic()
+    for attempt in range(LLM_MAX_RETRIES):
+        try:
+            output, usage = await _complete(prompt, model, call_site)
+            try:
+                text = strip_reasoning(output)
+                result = text if schema is None else parse_json(text, schema)
+            except ValueError:
+                extraction_stats["malformed"] += 1
+                raise
+            extraction_stats["parsed"] += 1
+            # The old split("</think>")[1] and bare JSON parse would have retried these
+            if "</think>" not in output or (
+                schema is not None and not text.strip().startswith(("[", "{"))
+            ):
+                extraction_stats["retries_avoided"] += 1
+            usage["latency"] = time.monotonic() - started
+            return text, result, usage
+
+        except Exception as e:
+            if attempt == LLM_MAX_RETRIES - 1 or not is_retryable(e):
+                raise Exception(f"Failed after {attempt + 1} attempts: {str(e)}")
+            delay = retry_delay(attempt, e)
+            logger.debug(f"Attempt {attempt + 1} failed ({str(e)}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+def replay_latency(record: dict) -> float:
+    return LLM_REPLAY_LATENCY + record["usage"]["completion_tokens"] * LLM_REPLAY_TOKEN_SECONDS
+
+
+async def _complete(prompt: str, model: str, call_site: str) -> Tuple[str, Dict[str, Any]]:
+    """One raw completion, reasoning block included, from the configured backend"""
+    if LLM_BACKEND == "replay":
+        record = fixtures.get(prompt)
+        await asyncio.sleep(replay_latency(record))
+        return record["output"], dict(record["usage"])
+
+    estimated = estimate_tokens(prompt)
+    await rate_limiter.acquire(estimated)
+    started = time.monotonic()
+    response = await get_client().chat.completions.create(
+        messages=[
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ],
+        model=model,
+        stream=False,
+    )
+    output = response.choices[0].message.content
+    usage = {
+        "prompt_tokens": getattr(response.usage, "prompt_tokens", 0),
+        "completion_tokens": getattr(response.usage, "completion_tokens", 0),
+        "latency": time.monotonic() - started,
+    }
+    rate_limiter.settle(estimated, usage["prompt_tokens"] + usage["completion_tokens"])
+    if LLM_BACKEND == "record":
+        fixtures.record(prompt, output, usage, call_site)
+    return output, usage
+
+
+class ThinkStripper:
+    """Drops a leading <think>...</think> reasoning block from streamed text as it arrives"""
+
+    OPEN, CLOSE = "<think>", "</think>"
+
+    def __init__(self):
+        self.state = "start"
+        self.buffer = ""
+
+    def feed(self, text: str) -> str:
+        if self.state == "body":
+            return text
+        self.buffer += text
+
+        if self.state == "start":
+            head = self.buffer.lstrip()
+            if self.OPEN.startswith(head):
+                # Not enough text yet to tell whether a reasoning block follows
+                return ""
+            if not head.startswith(self.OPEN):
+                self.state = "body"
+                text, self.buffer = self.buffer, ""
+                return text
+            self.state = "think"
+
+        end = self.buffer.find(self.CLOSE)
+        if end == -1:
+            # Keep just enough to spot a closing tag split across chunks
+            self.buffer = self.buffer[-(len(self.CLOSE) - 1):]
+            return ""
+        self.state = "body"
+        text, self.buffer = self.buffer[end + len(self.CLOSE):], ""
+        return text
+
+
+class JsonArrayScanner:
+    """Pulls each complete top-level object out of a JSON array as its text streams in"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.start = None
+        self.started = False
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, text: str) -> List[Any]:
+        self.buffer += text
+        objects = []
+        while self.pos < len(self.buffer):
+            char = self.buffer[self.pos]
+            if not self.started:
+                # Skip anything before the array, such as a code fence
+                if char == "[":
+                    self.started = True
+                    self.depth = 1
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                if self.depth == 1:
+                    self.start = self.pos
+                self.depth += 1
+            elif char in "}]" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 1 and self.start is not None:
+                    item = self.buffer[self.start:self.pos + 1]
+                    self.start = None
+                    try:
+                        objects.append(from_json(item, allow_inf_nan=True))
+                    except ValueError as e:
+                        logger.warning(f"Skipping malformed streamed item: {str(e)}")
+            self.pos += 1
+
+        # Drop consumed text, keeping any object still in progress
+        keep = self.pos if self.start is None else self.start
+        self.buffer = self.buffer[keep:]
+        self.pos -= keep
+        if self.start is not None:
+            self.start = 0
+        return objects
+
+
+async def generate_stream(prompt: str, call_site: str = "generate") -> AsyncIterator[str]:
+    """Stream a completion's text with the reasoning prefix removed
+
+    Failures before the first chunk are retried like generate; once text has
+    been yielded the error is raised to the caller.
+    """
+    if LLM_BACKEND == "replay":
+        async for text in _replay_stream(prompt, call_site):
+            yield text
+        return
+
+    model = os.getenv("GROQ_MODEL")
+    started = time.monotonic()
+    estimated = estimate_tokens(prompt)
+    for attempt in range(LLM_MAX_RETRIES):
+        stripper = ThinkStripper()
+        yielded = False
+        usage = None
+        raw = []
+        try:
+            await rate_limiter.acquire(estimated)
+            stream = await get_client().chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+                model=model,
+                stream=True,
+            )
+            async for chunk in stream:
+                x_groq = getattr(chunk, "x_groq", None)
+                if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                    usage = x_groq.usage
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content or ""
+                raw.append(content)
+                text = stripper.feed(content)
+                if text:
+                    yielded = True
+                    yield text
+
+            usage = {
+                "prompt_tokens": getattr(usage, "prompt_tokens", 0),
+                "completion_tokens": getattr(usage, "completion_tokens", 0),
+                "latency": time.monotonic() - started,
+            }
+            rate_limiter.settle(estimated, usage["prompt_tokens"] + usage["completion_tokens"])
+            record_usage(call_site, usage)
+            if LLM_BACKEND == "record":
+                fixtures.record(prompt, "".join(raw), usage, call_site)
+            return
+
+        except Exception as e:
+            if yielded or attempt == LLM_MAX_RETRIES - 1 or not is_retryable(e):
+                raise Exception(f"Failed after {attempt + 1} attempts: {str(e)}")
+            delay = retry_delay(attempt, e)
+            logger.debug(f"Attempt {attempt + 1} failed ({str(e)}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+async def _replay_stream(prompt: str, call_site: str, chunk_size: int = 16) -> AsyncIterator[str]:
+    """Replay a recorded completion in chunks, paced like the synthetic non-streaming latency"""
+    started = time.monotonic()
+    record = fixtures.get(prompt)
+    output = record["output"]
+    await asyncio.sleep(LLM_REPLAY_LATENCY)
+
+    stripper = ThinkStripper()
+    # Spread the per-token cost evenly over the chunks
+    chunks = range(0, len(output), chunk_size)
+    delay = (replay_latency(record) - LLM_REPLAY_LATENCY) / max(1, len(chunks))
+    for start in chunks:
+        await asyncio.sleep(delay)
+        text = stripper.feed(output[start:start + chunk_size])
+        if text:
+            yield text
+
+    record_usage(call_site, {**record["usage"], "latency": time.monotonic() - started})
+
+
+async def stream_json_array(
+    prompt: str, call_site: str = "generate", schema: Any = None
+) -> AsyncIterator[Any]:
+    """Yield each object of a JSON array completion as soon as it is complete
+
+    With a `schema` for the items, items that fail validation are skipped.
+    """
+    scanner = JsonArrayScanner()
+    adapter = get_adapter(schema) if schema is not None else None
+    async for text in generate_stream(prompt, call_site):
+        for item in scanner.feed(text):
+            if adapter is None:
+                yield item
+                continue
+            try:
+                yield adapter.dump_python(adapter.validate_python(item))
+            except ValueError as e:
+                logger.warning(f"Skipping streamed item that fails its schema: {str(e)}")
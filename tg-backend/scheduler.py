@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token buckets for requests per minute and tokens per minute; a limit of 0 disables it"""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until one request and `tokens` tokens fit in the buckets, then take them"""
+        if not self.rpm and not self.tpm:
+            return
+        tokens = min(tokens, self.tpm) if self.tpm else 0
+        # The lock keeps waiters in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                request_ok = not self.rpm or self._requests >= 1
+                tokens_ok = not self.tpm or self._tokens >= tokens
+                if request_ok and tokens_ok:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return
+                wait = 0.05
+                if not request_ok:
+                    wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+                if not tokens_ok:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+                self.waited += wait
+                await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct the token bucket once a call's real token count is known"""
+        # Responses without usage keep the estimate
+        if self.tpm and actual:
+            self._tokens -= actual - estimated
+
+    def pause(self, seconds: float) -> None:
+        """Empty the request bucket so nothing is sent for roughly `seconds` (e.g. after a 429)"""
+        if self.rpm:
+            self._refill()
+            self._requests = min(self._requests, 1 - seconds * self.rpm / 60)
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "requests_per_minute": self.rpm,
+            "tokens_per_minute": self.tpm,
+            "requests_available": self._requests,
+            "tokens_available": self._tokens,
+            "seconds_waited": self.waited,
+        }
+
+
+class AnalysisScheduler:
+    """Process-wide queue of window analyses with per-tenant fair queueing and backpressure
+
+    A tenant is whatever `submit` groups windows by. Workers take tenants
+    round-robin and, within a tenant, the freshest window first. Windows older
+    than `max_age` seconds are dropped. Once `max_backlog` windows are queued,
+    a new window is either merged into a queued window for the same key
+    ("coalesce") or displaces the oldest queued window ("drop").
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Dict], str], Awaitable[Any]],  # (messages, key)
+        workers: int = 4,
+        max_backlog: int = 100,
+        policy: str = "coalesce",
+        max_age: float = 900,
+        max_messages: int = 50,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_backlog = max_backlog
+        self.policy = policy
+        self.max_age = max_age
+        self.max_messages = max_messages
+
+        self._queues: Dict[str, Deque[dict]] = {}
+        self._tenants: Deque[str] = deque()
+        self._ready = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "coalesced": 0, "dropped": 0, "stale": 0}
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, tenant: str, key: str, messages: List[Dict]) -> bool:
+        """Queue a window for analysis. Returns False if it was folded into a queued one"""
+        self.counters["submitted"] += 1
+        if len(self) >= self.max_backlog:
+            if self.policy == "coalesce" and self._coalesce(tenant, key, messages):
+                return False
+            self._drop_oldest()
+
+        job = {"tenant": tenant, "key": key, "messages": messages, "enqueued_at": time.monotonic()}
+        if tenant not in self._queues:
+            self._queues[tenant] = deque()
+            self._tenants.append(tenant)
+        self._queues[tenant].append(job)
+        self._ready.set()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "queued": len(self),
+            "tenants_queued": len(self._queues),
+            "policy": self.policy,
+        }
+
+    def _coalesce(self, tenant: str, key: str, messages: List[Dict]) -> bool:
+        for job in reversed(self._queues.get(tenant, ())):
+            if job["key"] == key:
+                fresh = [message for message in messages if not message["overlap"]]
+                job["messages"] = (job["messages"] + fresh)[-self.max_messages:]
+                job["enqueued_at"] = time.monotonic()
+                self.counters["coalesced"] += 1
+                return True
+        return False
+
+    def _drop_oldest(self) -> None:
+        oldest: Optional[str] = None
+        for tenant, queue in self._queues.items():
+            if oldest is None or queue[0]["enqueued_at"] < self._queues[oldest][0]["enqueued_at"]:
+                oldest = tenant
+        if oldest is None:
+            return
+        job = self._queues[oldest].popleft()
+        self._discard_if_empty(oldest)
+        self.counters["dropped"] += 1
+        logger.warning(f"Analysis backlog full, dropped window {job['key']}")
+
+    def _discard_if_empty(self, tenant: str) -> None:
+        if not self._queues[tenant]:
+            del self._queues[tenant]
+            self._tenants.remove(tenant)
+
+    def _next_job(self) -> Optional[dict]:
+        now = time.monotonic()
+        while self._tenants:
+            tenant = self._tenants.popleft()
+            queue = self._queues[tenant]
+            job = queue.pop()
+            if queue:
+                self._tenants.append(tenant)
+            else:
+                del self._queues[tenant]
+            if now - job["enqueued_at"] > self.max_age:
+                self.counters["stale"] += 1
+                continue
+            return job
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            try:
+                await self.handler(job["messages"], job["key"])
+                self.counters["completed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["failed"] += 1
+                logger.error(f"Analysis of window {job['key']} failed: {str(e)}")
@@ -1,21 +1,53 @@
 import logging
 import logging.handlers
-from datetime import datetime, UTC
+from datetime import datetime, timedelta, UTC
 import os
 import asyncio
+import json
 import random
+import time
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from groq import Groq
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from motor.motor_asyncio import AsyncIOMotorClient
-from telethon import TelegramClient, events, functions
+from pymongo import UpdateOne
+from telethon import TelegramClient, errors, events, functions, types, utils
 from telethon.sessions import StringSession
 from typing import Dict, List, Any, Tuple
 from dotenv import load_dotenv
 from cryptography.fernet import Fernet
-from pydantic_core import from_json
-from web3util import edu_balance, token_balance, buy_token, sell_token
+from web3util import (
+    async_edu_balance,
+    async_token_balance,
+    async_buy_token,
+    async_sell_token,
+    async_bulk_balances,
+    async_poll_key_links,
+    close_async_session,
+    key_cache,
+    open_async_session,
+    token_addresses,
+    token_registry,
+)
+from cache import TTLCache
+from window_buffer import WindowBuffer
+from dedup import MessageDeduplicator
+from llm import (
+    generate,
+    generate_with_usage,
+    stream_json_array,
+    cached_output,
+    cache_output,
+    close_client,
+    usage_stats as llm_usage_stats,
+    cache_stats as llm_cache_stats,
+    extraction_stats as llm_extraction_stats,
+    rate_limit_stats as llm_rate_limit_stats,
+    fixture_stats as llm_fixture_stats,
+)
+from scheduler import AnalysisScheduler
+from ticker_filter import TickerMatcher, load_aliases
 from rich import print
 
 # Configure logging
@@ -73,6 +105,41 @@ ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", Fernet.generate_key().decode())
 API_ID = int(os.getenv("API_ID"))
 API_HASH = os.getenv("API_HASH")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "users")
+SENDER_CACHE_SIZE = int(os.getenv("SENDER_CACHE_SIZE", 2048))
+SENDER_CACHE_TTL = int(os.getenv("SENDER_CACHE_TTL", 3600))
+STARTUP_CONCURRENCY = int(os.getenv("STARTUP_CONCURRENCY", 10))
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", 5))
+WINDOW_CAPACITY = int(os.getenv("WINDOW_CAPACITY", 100))
+WINDOW_SPILL_PATH = os.getenv("WINDOW_SPILL_PATH")
+WINDOW_SIZE = int(os.getenv("WINDOW_SIZE", 10))
+WINDOW_SECONDS = float(os.getenv("WINDOW_SECONDS", 300))
+WINDOW_MIN_INTERVAL = float(os.getenv("WINDOW_MIN_INTERVAL", 30))
+WINDOW_OVERLAP = int(os.getenv("WINDOW_OVERLAP", 3))
+BACKFILL_LIMIT = int(os.getenv("BACKFILL_LIMIT", 200))
+BACKFILL_MAX_AGE = float(os.getenv("BACKFILL_MAX_AGE", 6 * 3600))
+LAST_MESSAGE_FLUSH_SECONDS = float(os.getenv("LAST_MESSAGE_FLUSH_SECONDS", 10))
+ENTITY_INDEX_TTL = float(os.getenv("ENTITY_INDEX_TTL", 3600))
+ENTITY_INDEX_REFRESH_LIMIT = int(os.getenv("ENTITY_INDEX_REFRESH_LIMIT", 50))
+TOPIC_CACHE_SIZE = int(os.getenv("TOPIC_CACHE_SIZE", 1024))
+TOPIC_CACHE_TTL = int(os.getenv("TOPIC_CACHE_TTL", 600))
+TOPIC_FETCH_CONCURRENCY = int(os.getenv("TOPIC_FETCH_CONCURRENCY", 5))
+FLOOD_WAIT_RETRIES = int(os.getenv("FLOOD_WAIT_RETRIES", 2))
+DEDUP_HORIZON = int(os.getenv("DEDUP_HORIZON", 200))
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.8))
+# "group" keeps a horizon per chat window, "global" one for all chats, catching cross-group forwards
+DEDUP_SCOPE = os.getenv("DEDUP_SCOPE", "group")
+TWEETS_CACHE_TTL = float(os.getenv("TWEETS_CACHE_TTL", 900))
+TWEET_ANALYSIS_CACHE_TTL = float(os.getenv("TWEET_ANALYSIS_CACHE_TTL", 900))
+VALIDATION_BATCH = os.getenv("VALIDATION_BATCH", "true").lower() in ("1", "true", "yes")
+TICKER_PREFILTER = os.getenv("TICKER_PREFILTER", "true").lower() in ("1", "true", "yes")
+TICKER_ALIASES_PATH = os.getenv("TICKER_ALIASES_PATH", "ticker_aliases.json")
+LLM_STREAMING = os.getenv("LLM_STREAMING", "false").lower() in ("1", "true", "yes")
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 4))
+ANALYSIS_MAX_BACKLOG = int(os.getenv("ANALYSIS_MAX_BACKLOG", 100))
+ANALYSIS_BACKPRESSURE = os.getenv("ANALYSIS_BACKPRESSURE", "coalesce")  # "coalesce" or "drop"
+ANALYSIS_MAX_AGE = float(os.getenv("ANALYSIS_MAX_AGE", 900))
+CLAIMED_MESSAGE_CACHE_SIZE = int(os.getenv("CLAIMED_MESSAGE_CACHE_SIZE", 20000))
+KEY_LINK_POLL_SECONDS = float(os.getenv("KEY_LINK_POLL_SECONDS", 15))
 fernet = Fernet(ENCRYPTION_KEY)
 
 client = AsyncIOMotorClient(MONGO_URI)
@@ -82,10 +149,72 @@ WATCHED_GROUPS_COLLECTION = "watched_groups"
 
 active_watchers = {}
 
-queue = {}
+# user_id -> group_id -> watcher_key -> route, served by the user's single client
+group_routes: Dict[str, Dict[int, Dict[str, dict]]] = {}
+
+# (user_id, group_id, topic_id) -> watch entry, mirrors WATCHED_GROUPS_COLLECTION
+watch_entry_cache: Dict[Tuple[str, int, Any], dict] = {}
+# user_id -> watched topic ids (group id for whole-group watches)
+watched_topic_ids: Dict[str, set] = {}
+
+# (user_id, group_id, topic_id) -> newest processed message id, persisted periodically
+last_message_ids: Dict[Tuple[str, int, Any], int] = {}
+dirty_message_ids: set = set()
+persist_task: asyncio.Task = None
+key_link_task: asyncio.Task = None
+# watcher_key -> live events held back while the watcher backfills its gap
+backfilling: Dict[str, list] = {}
+
+# user_id -> {"dialogs", "by_title", "by_username", "built_at"}, built from the user's dialogs
+entity_indexes: Dict[str, dict] = {}
+
+# group_id -> forum topics, shared by the dashboard and watch-group
+topic_cache = TTLCache(TOPIC_CACHE_SIZE, TOPIC_CACHE_TTL)
+# user_id -> {"semaphore", "paused_until"}, throttling Telegram requests per account
+flood_limiters: Dict[str, dict] = {}
+
+# user_id -> sender_id -> display name, shared by all of a user's watchers
+sender_caches: Dict[str, TTLCache] = {}
+
+# Per group/topic message windows awaiting analysis
+window_buffer = WindowBuffer(WINDOW_CAPACITY, WINDOW_SPILL_PATH)
+# Drops reposted and forwarded copies before they take a window slot
+deduplicator = MessageDeduplicator(DEDUP_HORIZON, DEDUP_THRESHOLD)
+# Finds mentions of tradable tokens so windows without any skip get_alpha
+ticker_matcher = TickerMatcher(load_aliases(token_addresses, TICKER_ALIASES_PATH))
+prefilter_stats = {"windows": 0, "skipped": 0}
+# key -> {"config", "last_analysis", "timer", "due"}
+window_state: Dict[str, dict] = {}
+# window key -> users watching that chat window; each window is analysed once for all of them
+window_subscribers: Dict[str, set] = {}
+# claim_key of messages already buffered, as every subscriber's client delivers them
+claimed_messages = TTLCache(CLAIMED_MESSAGE_CACHE_SIZE, BACKFILL_MAX_AGE)
+# Flushed windows waiting for get_alpha, queued fairly per chat; analyse_window is defined further down
+analysis_scheduler = AnalysisScheduler(
+    lambda messages, key: analyse_window(messages, key),
+    workers=ANALYSIS_WORKERS,
+    max_backlog=ANALYSIS_MAX_BACKLOG,
+    policy=ANALYSIS_BACKPRESSURE,
+    max_age=ANALYSIS_MAX_AGE,
+    max_messages=WINDOW_CAPACITY,
+)
 
 temp_clients: Dict[str, dict] = {}
 message_listener_clients: Dict[str, TelegramClient] = {}
+listener_tasks: Dict[str, asyncio.Task] = {}
+
+startup_task: asyncio.Task = None
+startup_progress = {
+    "status": "starting",
+    "users_total": 0,
+    "users_ready": 0,
+    "users_failed": 0,
+    "watchers_total": 0,
+    "watchers_ready": 0,
+    "watchers_failed": 0,
+    "started_at": None,
+    "completed_at": None,
+}
 
 
 class UserInitRequest(BaseModel):
@@ -98,6 +227,10 @@ class WatchGroupRequest(BaseModel):
     group_name: str
     topic_name: str = None
     webhook_url: str = None
+    window_size: int = None
+    window_seconds: float = None
+    min_analysis_interval: float = None
+    window_overlap: int = None
 
 
 class VerifyOTPRequest(BaseModel):
@@ -110,6 +243,33 @@ class SendMessageRequest(BaseModel):
     message: str
 
 
+# Schemas the LLM's JSON answers are validated against
+
+class Alpha(BaseModel):
+    token: str
+    texts: List[str] = []
+    sentiment: str
+    confidence: float = 0.0
+
+
+class TweetsResponse(BaseModel):
+    tweets: List[str]
+
+
+class TweetSentimentResponse(BaseModel):
+    sentiment: str
+
+
+class TokenValidation(BaseModel):
+    token: str
+    tweets: List[str]
+    sentiment: str
+
+
+class ValidationBatchResponse(BaseModel):
+    tokens: List[TokenValidation] = []
+
+
 def encrypt_data(data: str) -> str:
     return fernet.encrypt(data.encode()).decode()
 
@@ -118,9 +278,9 @@ def decrypt_data(encrypted_data: str) -> str:
     return fernet.decrypt(encrypted_data.encode()).decode()
 
 
-def generate_reply(message_text: str) -> str:
+async def generate_reply(message_text: str) -> str:
     """Dummy reply generator"""
-    response = generate("You are Arnab's helpful assistant that generates replies to messages representing Arnab. The user will send you a message and you will generate a reply to it. The reply should be a single sentence and should be in the same language as the message. The reply should be short and to the point. The message is: " + message_text)
+    response = await generate("You are Arnab's helpful assistant that generates replies to messages representing Arnab. The user will send you a message and you will generate a reply to it. The reply should be a single sentence and should be in the same language as the message. The reply should be short and to the point. The message is: " + message_text, call_site="generate_reply")
     return response
 
 async def init_message_listener(
@@ -158,18 +318,30 @@ async def init_message_listener(
                 try:
                     if not event.is_private:
                         return
-                    # reply = generate_reply(event.message.text)
+                    # reply = await generate_reply(event.message.text)
                     # await event.reply(reply)
                 except Exception as e:
                     error(f"Error in message handler for user {user_id}: {str(e)}")
                     # Don't raise the exception to keep the listener running
 
+            @client.on(events.NewMessage())
+            async def group_handler(event):
+                try:
+                    await route_group_message(user_id, event)
+                except Exception as e:
+                    error(f"Error routing group message for user {user_id}: {str(e)}")
+
             # Store the client in the dictionary
             message_listener_clients[user_id] = client
             
             # Run the client in the background
-            asyncio.create_task(client.run_until_disconnected())
+            listener_tasks[user_id] = asyncio.create_task(client.run_until_disconnected())
             info(f"Message listener initialized for user {user_id}")
+
+            # A reconnect leaves existing routes in place; catch them up on the gap
+            for group_id, chat_routes in group_routes.get(user_id, {}).items():
+                for route in chat_routes.values():
+                    asyncio.create_task(backfill_group(user_id, group_id, route["topic_id"]))
             
         except Exception as e:
             error(f"Error setting up Telegram client for user {user_id}: {str(e)}")
@@ -214,111 +386,167 @@ async def get_user_client(user_id: str) -> TelegramClient:
 
 
 async def create_new_client(user_id: str) -> TelegramClient:
-    """Create a new Telegram client for a user"""
+    """Create the shared Telegram client for a user, with listeners and group router attached"""
     user = await db[COLLECTION_NAME].find_one({"user_id": user_id})
     if not user:
         raise HTTPException(status_code=404, detail="User not registered")
 
-    session = decrypt_data(user["session_string"])
-    client = TelegramClient(
-        StringSession(session), user["api_id"], decrypt_data(user["api_hash"])
+    await init_message_listener(
+        user_id,
+        user["api_id"],
+        decrypt_data(user["api_hash"]),
+        decrypt_data(user["session_string"]),
     )
-
-    try:
-        await client.connect()
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            raise HTTPException(status_code=401, detail="Session expired")
-        
-        # Store the client for future use
-        message_listener_clients[user_id] = client
-        return client
-    except Exception as e:
-        if client.is_connected():
-            await client.disconnect()
-        raise HTTPException(status_code=500, detail=f"Error creating client: {str(e)}")
+    return message_listener_clients[user_id]
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Start message listeners for all existing users on startup"""
+    """Start message listeners and group watchers for all existing users in the background"""
+    global startup_task, persist_task, key_link_task
     debug("Starting application...")
+    await open_async_session()
+    persist_task = asyncio.create_task(persist_last_message_ids_loop())
+    key_link_task = asyncio.create_task(watch_key_links_loop())
+    analysis_scheduler.start()
+    startup_task = asyncio.create_task(start_all_listeners())
 
-    debug("Initializing message listeners for existing users...")
-    async for user in db[COLLECTION_NAME].find():
+
+async def start_all_listeners():
+    """Bring up every user's client and watchers, at most STARTUP_CONCURRENCY users at a time"""
+    startup_progress["started_at"] = datetime.now(UTC).isoformat()
+
+    try:
+        users = await db[COLLECTION_NAME].find().to_list(None)
+        watch_entries = await db[WATCHED_GROUPS_COLLECTION].find({}).to_list(None)
+    except Exception as e:
+        error(f"Error loading users and watch entries on startup: {str(e)}")
+        startup_progress["status"] = "failed"
+        return
+
+    debug(f"Found {len(users)} users and {len(watch_entries)} watch entries to initialize")
+
+    # Group entries by user_id
+    user_watch_entries = {}
+    for entry in watch_entries:
+        user_watch_entries.setdefault(entry["user_id"], []).append(entry)
+
+    # Warm the watch-entry cache from the same query
+    for user_id, entries in user_watch_entries.items():
+        fill_watch_cache(user_id, entries)
+
+    startup_progress["users_total"] = len(users)
+    startup_progress["watchers_total"] = len(watch_entries)
+    startup_progress["status"] = "initializing"
+
+    # Watch entries whose user no longer exists can never be started
+    user_ids = {user["user_id"] for user in users}
+    for user_id, entries in user_watch_entries.items():
+        if user_id not in user_ids:
+            error(f"User {user_id} not found for {len(entries)} watch entries")
+            startup_progress["watchers_failed"] += len(entries)
+
+    semaphore = asyncio.Semaphore(STARTUP_CONCURRENCY)
+    await asyncio.gather(
+        *[
+            start_user_listeners(user, user_watch_entries.get(user["user_id"], []), semaphore)
+            for user in users
+        ]
+    )
+    resume_restored_windows()
+
+    startup_progress["status"] = "ready"
+    startup_progress["completed_at"] = datetime.now(UTC).isoformat()
+    debug("Startup process completed")
+
+
+async def start_user_listeners(user: dict, entries: List[Dict], semaphore: asyncio.Semaphore):
+    """Initialize one user's listener, then register all of their group watchers"""
+    user_id = user["user_id"]
+    async with semaphore:
         try:
-            debug(f"Setting up listener for user {user['user_id']}")
-            api_id = user["api_id"]
-            api_hash = decrypt_data(user["api_hash"])
-            session_string = decrypt_data(user["session_string"])
+            debug(f"Setting up listener for user {user_id}")
             await init_message_listener(
-                user["user_id"], api_id, api_hash, session_string
+                user_id,
+                user["api_id"],
+                decrypt_data(user["api_hash"]),
+                decrypt_data(user["session_string"]),
             )
+            startup_progress["users_ready"] += 1
         except Exception as e:
-            error(f"Failed to initialize listener for {user['user_id']}: {str(e)}")
+            error(f"Failed to initialize listener for {user_id}: {str(e)}")
+            startup_progress["users_failed"] += 1
+            startup_progress["watchers_failed"] += len(entries)
+            return
 
-    debug("Initializing group watchers...")
-    try:
-        # Group watch entries by user_id for better organization
-        user_watch_entries = {}
-        cursor = db[WATCHED_GROUPS_COLLECTION].find({})
-        watch_entries = await cursor.to_list(None)
-        debug(f"Found {len(watch_entries)} watch entries to initialize")
-
-        # Group entries by user_id
-        for entry in watch_entries:
-            user_id = entry["user_id"]
-            if user_id not in user_watch_entries:
-                user_watch_entries[user_id] = []
-            user_watch_entries[user_id].append(entry)
-
-        # Initialize watchers for each user in parallel
-        for user_id, entries in user_watch_entries.items():
-            debug(f"Initializing watchers for user {user_id} with {len(entries)} groups")
-            for entry in entries:
-                try:
-                    debug(
-                        f"Starting watcher for group {entry['group_name']} (ID: {entry['group_id']})"
-                    )
-                    await start_group_watcher(
-                        entry["user_id"], entry["group_id"], entry.get("topic_id")
-                    )
-                except Exception as e:
-                    error(f"Failed to start watcher for {entry['group_name']}: {str(e)}")
+        debug(f"Initializing watchers for user {user_id} with {len(entries)} groups")
+        for entry in entries:
+            try:
+                await start_group_watcher(
+                    entry["user_id"], entry["group_id"], entry.get("topic_id")
+                )
+                startup_progress["watchers_ready"] += 1
+            except Exception as e:
+                error(f"Failed to start watcher for {entry['group_name']}: {str(e)}")
+                startup_progress["watchers_failed"] += 1
 
-    except Exception as e:
-        error(f"Error restarting watchers: {str(e)}")
 
-    debug("Startup process completed")
+@app.get("/ready")
+async def readiness():
+    """Report startup progress; 503 until every listener and watcher has been attempted"""
+    status_code = 200 if startup_progress["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=startup_progress)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Disconnect all message listeners on shutdown"""
+    """Disconnect all message listeners in parallel, bounded by SHUTDOWN_TIMEOUT"""
     debug("Shutting down application...")
-    
-    # Cancel all active watchers
-    debug(f"Cancelling {len(active_watchers)} active watchers")
-    for watcher_key, task in active_watchers.items():
-        try:
-            debug(f"Cancelling watcher {watcher_key}")
-            task.cancel()
-        except Exception as e:
-            error(f"Error cancelling watcher {watcher_key}: {str(e)}")
-    
-    # Wait for all tasks to be cancelled
-    if active_watchers:
-        await asyncio.sleep(2)  # Give tasks time to cancel
-    
-    # Disconnect all clients
+
+    if startup_task and not startup_task.done():
+        startup_task.cancel()
+    if persist_task and not persist_task.done():
+        persist_task.cancel()
+    if key_link_task and not key_link_task.done():
+        key_link_task.cancel()
+
+    # Drop all watcher routes so no further messages are dispatched
+    debug(f"Removing {len(active_watchers)} active watchers")
+    active_watchers.clear()
+    group_routes.clear()
+
+    # Disconnect all clients and save watcher positions for the next backfill
     debug(f"Disconnecting {len(message_listener_clients)} message listener clients")
-    for user_id, client in message_listener_clients.items():
-        try:
-            debug(f"Disconnecting client for user {user_id}")
-            await client.disconnect()
-        except Exception as e:
-            error(f"Error disconnecting client for user {user_id}: {str(e)}")
-    
+    clients = list(message_listener_clients.items())
+    try:
+        saved, *results = await asyncio.wait_for(
+            asyncio.gather(
+                persist_last_message_ids(),
+                *[client.disconnect() for _, client in clients],
+                return_exceptions=True,
+            ),
+            timeout=SHUTDOWN_TIMEOUT,
+        )
+        if isinstance(saved, Exception):
+            error(f"Error saving last message ids: {str(saved)}")
+        for (user_id, _), result in zip(clients, results):
+            if isinstance(result, Exception):
+                error(f"Error disconnecting client for user {user_id}: {str(result)}")
+    except asyncio.TimeoutError:
+        warning(f"Client disconnects did not finish within {SHUTDOWN_TIMEOUT}s")
+
+    for task in listener_tasks.values():
+        if not task.done():
+            task.cancel()
+
+    for state in window_state.values():
+        if state["timer"] and not state["timer"].done():
+            state["timer"].cancel()
+    window_buffer.close()
+    await analysis_scheduler.stop()
+    await close_client()
+    await close_async_session()
+
     debug("Shutdown complete")
 
 
@@ -351,61 +579,26 @@ async def initialize_user(request: UserInitRequest):
 async def watch_group(request: WatchGroupRequest):
     """Add a group/channel to watch list"""
     try:
-        user = await db[COLLECTION_NAME].find_one({"user_id": request.user_id})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not registered")
-
-        session = decrypt_data(user["session_string"])
-        client = TelegramClient(
-            StringSession(session), user["api_id"], decrypt_data(user["api_hash"])
-        )
-
-        await client.connect()
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            raise HTTPException(status_code=401, detail="Session expired")
+        client = await get_user_client(request.user_id)
 
-        found_entity = None
+        found_entity = await find_group_entity(request.user_id, client, request.group_name)
         found_topic_id = None
 
-        try:
-            found_entity = await client.get_entity(request.group_name)
-        except:
-            dialogs = await client.get_dialogs()
-            for dialog in dialogs:
-                if dialog.title.lower() == request.group_name.lower() or (
-                    hasattr(dialog.entity, "username")
-                    and dialog.entity.username
-                    and dialog.entity.username.lower() == request.group_name.lower()
-                ):
-                    found_entity = dialog.entity
-                    break
-
         if not found_entity:
-            await client.disconnect()
             raise HTTPException(
                 status_code=404,
                 detail=f"Group/channel '{request.group_name}' not found",
             )
 
         if request.topic_name and getattr(found_entity, "forum", False):
-            topics = await client(
-                functions.channels.GetForumTopicsRequest(
-                    channel=found_entity,
-                    offset_date=0,
-                    offset_id=0,
-                    offset_topic=0,
-                    limit=100,
-                )
-            )
+            topics = await get_forum_topics(request.user_id, client, found_entity)
 
-            for topic in topics.topics:
-                if topic.title.lower() == request.topic_name.lower():
-                    found_topic_id = topic.id
+            for topic in topics:
+                if (topic["title"] or "").lower() == request.topic_name.lower():
+                    found_topic_id = topic["id"]
                     break
 
             if not found_topic_id:
-                await client.disconnect()
                 raise HTTPException(
                     status_code=404,
                     detail=f"Topic '{request.topic_name}' not found in the forum",
@@ -420,6 +613,10 @@ async def watch_group(request: WatchGroupRequest):
             "topic_id": found_topic_id,
             "topic_name": request.topic_name if found_topic_id else None,
             "webhook_url": request.webhook_url,
+            "window_size": request.window_size,
+            "window_seconds": request.window_seconds,
+            "min_analysis_interval": request.min_analysis_interval,
+            "window_overlap": request.window_overlap,
             "created_at": datetime.now(),
             "username": getattr(found_entity, "username", None),
         }
@@ -434,11 +631,11 @@ async def watch_group(request: WatchGroupRequest):
             upsert=True,
         )
 
+        invalidate_watch_cache(request.user_id)
+
         # Always start the watcher after adding/updating the entry
         await start_group_watcher(request.user_id, found_entity.id, found_topic_id)
 
-        await client.disconnect()
-
         return {
             "status": "success",
             "message": f"Now watching {'topic' if found_topic_id else 'group/channel'}: {found_entity.title}{f' - {request.topic_name}' if found_topic_id else ''}",
@@ -449,6 +646,136 @@ async def watch_group(request: WatchGroupRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def index_dialog(index: dict, dialog):
+    """Add or update one dialog in a user's entity index"""
+    entity = dialog.entity
+    index["dialogs"][entity.id] = dialog
+    if dialog.title:
+        index["by_title"].setdefault(dialog.title.lower(), entity)
+    username = getattr(entity, "username", None)
+    if username:
+        index["by_username"][username.lower()] = entity
+
+
+async def get_entity_index(user_id: str, client: TelegramClient) -> dict:
+    """Return the user's entity index, rebuilding it from one dialogs fetch when stale"""
+    index = entity_indexes.get(user_id)
+    if index and time.monotonic() - index["built_at"] < ENTITY_INDEX_TTL:
+        return index
+
+    index = {"dialogs": {}, "by_title": {}, "by_username": {}, "built_at": time.monotonic()}
+    # Dialogs come most recent first, so the most recent chat wins a title clash
+    for dialog in await client.get_dialogs():
+        index_dialog(index, dialog)
+    entity_indexes[user_id] = index
+    return index
+
+
+async def refresh_entity_index(user_id: str, client: TelegramClient) -> dict:
+    """Merge the most recent dialogs into the index to pick up newly joined chats"""
+    index = await get_entity_index(user_id, client)
+    for dialog in await client.get_dialogs(limit=ENTITY_INDEX_REFRESH_LIMIT):
+        index["by_title"].pop((dialog.title or "").lower(), None)
+        index_dialog(index, dialog)
+    return index
+
+
+def lookup_entity(index: dict, name: str):
+    key = name.strip().lower()
+    entity = index["by_title"].get(key) or index["by_username"].get(key.lstrip("@"))
+    if entity is None and key.lstrip("-").isdigit():
+        group_id, _ = utils.resolve_id(int(key))
+        dialog = index["dialogs"].get(group_id)
+        entity = dialog.entity if dialog else None
+    return entity
+
+
+async def find_group_entity(user_id: str, client: TelegramClient, name: str):
+    """Find a chat by title, username or id via the user's entity index"""
+    index = await get_entity_index(user_id, client)
+    entity = lookup_entity(index, name)
+    if entity is None:
+        index = await refresh_entity_index(user_id, client)
+        entity = lookup_entity(index, name)
+    if entity is None:
+        # Public chats the user has not joined are not in the dialogs
+        try:
+            entity = await client.get_entity(name)
+        except Exception:
+            return None
+    return entity
+
+
+async def call_with_flood_wait(user_id: str, client: TelegramClient, request):
+    """Send a request under the user's concurrency limit, pausing all of them on FloodWait"""
+    limiter = flood_limiters.get(user_id)
+    if limiter is None:
+        limiter = flood_limiters[user_id] = {
+            "semaphore": asyncio.Semaphore(TOPIC_FETCH_CONCURRENCY),
+            "paused_until": 0.0,
+        }
+
+    for attempt in range(FLOOD_WAIT_RETRIES + 1):
+        async with limiter["semaphore"]:
+            pause = limiter["paused_until"] - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            try:
+                return await client(request)
+            except errors.FloodWaitError as e:
+                warning(f"Flood wait of {e.seconds}s for user {user_id}")
+                limiter["paused_until"] = max(
+                    limiter["paused_until"], time.monotonic() + e.seconds
+                )
+                if attempt == FLOOD_WAIT_RETRIES:
+                    raise
+
+
+async def get_forum_topics(user_id: str, client: TelegramClient, entity) -> List[Dict]:
+    """Fetch every topic of a forum, paginating fully, cached per group for TOPIC_CACHE_TTL"""
+    topics = topic_cache.get(entity.id)
+    if topics is not None:
+        return topics
+
+    topics = []
+    offset_date, offset_id, offset_topic = 0, 0, 0
+    while True:
+        result = await call_with_flood_wait(
+            user_id,
+            client,
+            functions.channels.GetForumTopicsRequest(
+                channel=entity,
+                offset_date=offset_date,
+                offset_id=offset_id,
+                offset_topic=offset_topic,
+                limit=100,
+            ),
+        )
+        for topic in result.topics:
+            topics.append(
+                {
+                    "id": topic.id,
+                    "title": getattr(topic, "title", None),
+                    "icon_color": getattr(topic, "icon_color", None),
+                    "icon_emoji": getattr(topic, "icon_emoji", None),
+                }
+            )
+
+        if not result.topics or len(topics) >= result.count:
+            break
+
+        # Continue after the last topic, ordered by its top message
+        last = result.topics[-1]
+        top_messages = {message.id: message for message in result.messages}
+        top_message = top_messages.get(getattr(last, "top_message", None))
+        offset_date = top_message.date if top_message else 0
+        offset_id = getattr(last, "top_message", 0)
+        offset_topic = last.id
+
+    topic_cache.set(entity.id, topics)
+    return topics
+
+
 @app.get("/watched-groups/{user_id}")
 async def get_watched_groups(user_id: str):
     """Get all watched groups for a user"""
@@ -468,13 +795,41 @@ async def get_watched_groups(user_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def get_topic_ids(user_id: str):
+def fill_watch_cache(user_id: str, watched_groups: List[Dict]):
+    """Replace the cached watch entries and topic ids for a user"""
+    invalidate_watch_cache(user_id)
+    for group in watched_groups:
+        key = (user_id, group["group_id"], group.get("topic_id"))
+        watch_entry_cache[key] = group
+    watched_topic_ids[user_id] = {
+        group["topic_id"] if group.get("topic_id") is not None else group["group_id"]
+        for group in watched_groups
+    }
+
+
+def invalidate_watch_cache(user_id: str):
+    """Drop a user's cached watch entries; they are reloaded on next access"""
+    for key in [key for key in watch_entry_cache if key[0] == user_id]:
+        del watch_entry_cache[key]
+    watched_topic_ids.pop(user_id, None)
+
+
+async def load_watch_cache(user_id: str):
+    if user_id in watched_topic_ids:
+        return
     cursor = db[WATCHED_GROUPS_COLLECTION].find({"user_id": user_id})
     watched_groups = await cursor.to_list(None)
-    return [
-        group["topic_id"] if group["topic_id"] is not None else group["group_id"]
-        for group in watched_groups
-    ]
+    fill_watch_cache(user_id, watched_groups)
+
+
+async def get_cached_watch_entry(user_id: str, group_id: int, topic_id: int = None):
+    await load_watch_cache(user_id)
+    return watch_entry_cache.get((user_id, group_id, topic_id))
+
+
+async def get_topic_ids(user_id: str):
+    await load_watch_cache(user_id)
+    return watched_topic_ids[user_id]
 
 
 @app.delete("/unwatch-group")
@@ -491,10 +846,8 @@ async def unwatch_group(user_id: str, group_id: int, topic_id: int = None):
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Watched group/topic not found")
 
-        watcher_key = f"{user_id}:{group_id}:{topic_id}"
-        if watcher_key in active_watchers:
-            active_watchers[watcher_key].cancel()
-            del active_watchers[watcher_key]
+        invalidate_watch_cache(user_id)
+        stop_group_watcher(user_id, group_id, topic_id)
 
         return {"status": "success", "message": "Stopped watching group/topic"}
 
@@ -503,192 +856,287 @@ async def unwatch_group(user_id: str, group_id: int, topic_id: int = None):
 
 
 async def start_group_watcher(user_id, group_id, topic_id=None):
-    """Start a background task to watch a group/channel for messages"""
+    """Route messages from a group/channel to a watcher over the user's shared client"""
     watcher_key = f"{user_id}:{group_id}:{topic_id}"
     debug(f"Starting group watcher with key: {watcher_key}")
 
-    # Cancel existing watcher if it exists
-    if watcher_key in active_watchers:
-        debug(f"Cancelling existing watcher for {watcher_key}")
-        try:
-            active_watchers[watcher_key].cancel()
-            await asyncio.sleep(1)  # Give the task time to cancel
-        except Exception as e:
-            error(f"Error cancelling watcher {watcher_key}: {str(e)}")
-        del active_watchers[watcher_key]
+    # Make sure the user's single connection is up; watchers never open their own
+    client = await get_user_client(user_id)
 
-    # Create a new watcher task
-    debug(f"Creating new watcher task for {watcher_key}")
-    task = asyncio.create_task(watch_group_messages(user_id, group_id, topic_id))
-    active_watchers[watcher_key] = task
-    
-    # Add error handling for the task
-    task.add_done_callback(lambda t: handle_watcher_task_done(t, watcher_key))
-    
-    debug(f"Watcher task created and stored for {watcher_key}")
-    return task
+    route = {"user_id": user_id, "group_id": group_id, "topic_id": topic_id}
+    group_routes.setdefault(user_id, {}).setdefault(group_id, {})[watcher_key] = route
+    active_watchers[watcher_key] = route
+    window_subscribers.setdefault(window_key(group_id, topic_id), set()).add(user_id)
 
+    debug(f"Watcher route registered for {watcher_key}")
 
-def handle_watcher_task_done(task, watcher_key):
-    """Handle task completion and cleanup"""
-    try:
-        # Check if the task was cancelled
-        if task.cancelled():
-            debug(f"Watcher task {watcher_key} was cancelled")
-            return
-        
-        # Check if there was an exception
-        exc = task.exception()
-        if exc:
-            error(f"Watcher task {watcher_key} failed with exception: {str(exc)}")
-            # Remove the failed watcher from active_watchers
-            if watcher_key in active_watchers:
-                del active_watchers[watcher_key]
-    except Exception as e:
-        error(f"Error handling watcher task completion for {watcher_key}: {str(e)}")
+    asyncio.create_task(backfill_group(user_id, group_id, topic_id))
+    return client
 
 
-async def watch_group_messages(user_id, group_id, topic_id=None):
-    """Background task to watch for messages in a group/channel using a dedicated client"""
-    client = None
+def stop_group_watcher(user_id, group_id, topic_id=None):
+    """Remove a watcher's route; the user's connection stays open"""
+    watcher_key = f"{user_id}:{group_id}:{topic_id}"
+    active_watchers.pop(watcher_key, None)
+
+    key = window_key(group_id, topic_id)
+    subscribers = window_subscribers.get(key, set())
+    subscribers.discard(user_id)
+    if not subscribers:
+        window_subscribers.pop(key, None)
+
+    user_routes = group_routes.get(user_id, {})
+    chat_routes = user_routes.get(group_id, {})
+    chat_routes.pop(watcher_key, None)
+    if not chat_routes:
+        user_routes.pop(group_id, None)
+    if not user_routes:
+        group_routes.pop(user_id, None)
+    debug(f"Watcher route removed for {watcher_key}")
+
+
+async def route_group_message(user_id: str, event):
+    """Dispatch a NewMessage event from a user's client to every watcher of its chat"""
+    user_routes = group_routes.get(user_id)
+    if not user_routes or event.chat_id is None:
+        return
+
+    group_id, _ = utils.resolve_id(event.chat_id)
+    chat_routes = user_routes.get(group_id)
+    if not chat_routes:
+        return
+
+    for route in list(chat_routes.values()):
+        await handle_group_message(event, user_id, group_id, route["topic_id"])
+
+
+async def handle_group_message(event, user_id, group_id, topic_id=None):
+    """Handle a single message for one (user, group, topic) watcher"""
     watcher_key = f"{user_id}:{group_id}:{topic_id}"
-    
     try:
-        info(f"Starting watch_group_messages for user {user_id}, group {group_id}, topic {topic_id}")
+        # Check if watcher is still active
+        if watcher_key not in active_watchers:
+            info(f"Watcher {watcher_key} is no longer active, ignoring message.")
+            return
 
-        # Get user data
+        # Hold live messages until the backfilled gap has been fed in order
+        if watcher_key in backfilling:
+            backfilling[watcher_key].append(event)
+            return
+
+        # Topic filtering logic
+        if topic_id is not None:
+            if not hasattr(event.message, "reply_to") or event.message.reply_to is None:
+                debug("Message has no reply_to attribute or is None")
+                return
+            if not hasattr(event.message.reply_to, "forum_topic") or not event.message.reply_to.forum_topic:
+                debug("Message is not in a forum topic")
+                return
+            
+            current_topic_ids = await get_topic_ids(user_id)
+            if event.message.reply_to.reply_to_msg_id not in current_topic_ids:
+                debug(f"Message topic ID {event.message.reply_to.reply_to_msg_id} not in watched topics for user {user_id}")
+                return
+        
+        if topic_id is not None and event.message.reply_to.reply_to_msg_id != topic_id:
+            debug(f"Message topic ID {event.message.reply_to.reply_to_msg_id} doesn't match specific watcher topic {topic_id}")
+            return
+        
+        # Get current watch entry
         try:
-            user = await db[COLLECTION_NAME].find_one({"user_id": user_id})
-            if not user:
-                error(f"User {user_id} not found for watcher")
+            current_watch_entry = await get_cached_watch_entry(user_id, group_id, topic_id)
+            if not current_watch_entry:
+                error(f"Watch entry not found for {watcher_key} during message processing.")
                 return
         except Exception as e:
-            error(f"Error fetching user data for watcher {watcher_key}: {str(e)}")
+            error(f"Error fetching current watch entry for {watcher_key}: {str(e)}")
             return
 
-        info(f"Found user {user_id} in database")
+        await ingest_group_message(event.message, current_watch_entry)
+
+    except Exception as e:
+        error(f"Error in message handler for watcher {watcher_key}: {str(e)}")
+
+
+def claim_key(window: str, message) -> tuple:
+    """Identity of a message that is the same in every subscriber's client"""
+    if isinstance(message.peer_id, types.PeerChannel):
+        return (window, message.id)
+    # Basic group message ids are numbered per account, so fall back to the content
+    return (window, message.sender_id, message.date, hash(message.text or ""))
 
-        # Get watch entry
+
+async def ingest_group_message(message, watch_entry: dict):
+    """Feed one message into its chat's shared window and record it as processed for the watcher"""
+    user_id = watch_entry["user_id"]
+    group_id = watch_entry["group_id"]
+    topic_id = watch_entry.get("topic_id")
+    watcher_key = f"{user_id}:{group_id}:{topic_id}"
+    window = window_key(group_id, topic_id)
+
+    # Other subscribers' clients deliver the same message; only the first copy is buffered
+    claim = claim_key(window, message)
+    if claim not in claimed_messages:
+        claimed_messages.set(claim, True)
+
+        # Process sender info
         try:
-            watch_entry = await db[WATCHED_GROUPS_COLLECTION].find_one(
-                {"user_id": user_id, "group_id": group_id, "topic_id": topic_id}
-            )
-            if not watch_entry:
-                error(f"Watch entry not found for {watcher_key}")
-                return
+            sender_name = await get_sender_name(user_id, message)
         except Exception as e:
-            error(f"Error fetching watch entry for {watcher_key}: {str(e)}")
-            return
-
-        info(f"Found watch entry for group {watch_entry['group_name']}")
-        info(f"Setting up DEDICATED client for user {user_id} to watch group {group_id}")
+            error(f"Error processing sender info for message in {watcher_key}: {str(e)}")
+            sender_name = "Unknown"
 
-        # Create and connect client
+        # Process message
         try:
-            session = decrypt_data(user["session_string"])
-            client = TelegramClient(
-                StringSession(session), user["api_id"], decrypt_data(user["api_hash"])
+            await process_message(
+                window,
+                watch_entry["group_name"],
+                watch_entry["topic_name"],
+                sender_name,
+                message.text,
+                user_id,
+                shared_window_config(group_id, topic_id),
             )
-            await client.connect()
-            
-            if not await client.is_user_authorized():
-                warning(f"User {user_id} not authorized for watcher {group_id}")
-                await client.disconnect()
-                return
         except Exception as e:
-            error(f"Error setting up client for watcher {watcher_key}: {str(e)}")
-            if client and client.is_connected():
-                await client.disconnect()
-            return
+            error(f"Error processing message in {watcher_key}: {str(e)}")
 
-        info(f"Dedicated client connected and authorized for watcher {watcher_key}")
+    key = (user_id, group_id, topic_id)
+    if message.id > last_message_ids.get(key, 0):
+        last_message_ids[key] = message.id
+        dirty_message_ids.add(key)
 
-        # Create message handler
-        @client.on(events.NewMessage(chats=group_id))
-        async def handler(event):
-            try:
-                # Check if watcher is still active
-                if watcher_key not in active_watchers:
-                    info(f"Watcher {watcher_key} is no longer active, ignoring message.")
-                    return
-
-                # Topic filtering logic
-                if topic_id is not None:
-                    if not hasattr(event.message, "reply_to") or event.message.reply_to is None:
-                        debug("Message has no reply_to attribute or is None")
-                        return
-                    if not hasattr(event.message.reply_to, "forum_topic") or not event.message.reply_to.forum_topic:
-                        debug("Message is not in a forum topic")
-                        return
-                    
-                    current_topic_ids = await get_topic_ids(user_id)
-                    if event.message.reply_to.reply_to_msg_id not in current_topic_ids:
-                        debug(f"Message topic ID {event.message.reply_to.reply_to_msg_id} not in watched topics for user {user_id}")
-                        return
-                
-                if topic_id is not None and event.message.reply_to.reply_to_msg_id != topic_id:
-                    debug(f"Message topic ID {event.message.reply_to.reply_to_msg_id} doesn't match specific watcher topic {topic_id}")
-                    return
-                
-                # Get current watch entry
-                try:
-                    current_watch_entry = await db[WATCHED_GROUPS_COLLECTION].find_one(
-                        {"user_id": user_id, "group_id": group_id, "topic_id": topic_id}
-                    )
-                    if not current_watch_entry:
-                        error(f"Watch entry not found for {watcher_key} during message processing.")
-                        return
-                except Exception as e:
-                    error(f"Error fetching current watch entry for {watcher_key}: {str(e)}")
-                    return
 
-                # Process sender info
-                try:
-                    sender = await event.get_sender()
-                    first_name = getattr(sender, "first_name", "") or ""
-                    last_name = getattr(sender, "last_name", "") or ""
-                    sender_name = f"{first_name} {last_name}"
-                    sender_name = sender_name.strip() or sender.username or "Unknown"
-                except Exception as e:
-                    error(f"Error processing sender info for message in {watcher_key}: {str(e)}")
-                    sender_name = "Unknown"
+async def resolve_group_peer(client: TelegramClient, group_id: int):
+    """Resolve a bare group id to an input peer, trying channel then basic group"""
+    for peer in (types.PeerChannel(group_id), types.PeerChat(group_id)):
+        try:
+            return await client.get_input_entity(peer)
+        except (ValueError, TypeError):
+            continue
+    raise ValueError(f"Could not resolve group {group_id}")
 
-                # Process message
-                try:
-                    await process_message(
-                        current_watch_entry["group_name"],
-                        current_watch_entry["topic_name"],
-                        sender_name,
-                        event.message.text,
-                        user_id,
-                    )
-                except Exception as e:
-                    error(f"Error processing message in {watcher_key}: {str(e)}")
 
-            except Exception as e:
-                error(f"Error in message handler for watcher {watcher_key}: {str(e)}")
+async def backfill_group(user_id, group_id, topic_id=None):
+    """Feed messages missed since the watcher's last processed id through the window path"""
+    watcher_key = f"{user_id}:{group_id}:{topic_id}"
+    if watcher_key in backfilling:
+        return
 
-        info(f"Event handler registered for dedicated watcher {watcher_key}")
-        
-        # Run the client until disconnected
-        await client.run_until_disconnected()
-        info(f"Watcher client {watcher_key} disconnected.")
+    watch_entry = await get_cached_watch_entry(user_id, group_id, topic_id)
+    if not watch_entry:
+        return
+    key = (user_id, group_id, topic_id)
+    last_id = last_message_ids.get(key) or watch_entry.get("last_message_id")
+    if not last_id:
+        # Never processed anything yet, so there is no gap to catch up on
+        return
 
-    except asyncio.CancelledError:
-        info(f"Watcher task for {watcher_key} was cancelled.")
-        if client and client.is_connected():
-            info(f"Disconnecting client for cancelled watcher {watcher_key}")
-            await client.disconnect()
+    backfilling[watcher_key] = []
+    try:
+        client = await get_user_client(user_id)
+        peer = await resolve_group_peer(client, group_id)
+        oldest = datetime.now(UTC) - timedelta(seconds=BACKFILL_MAX_AGE)
+
+        # Newest first, so the count cap keeps the most recent part of the gap
+        messages = []
+        async for message in client.iter_messages(
+            peer, min_id=last_id, limit=BACKFILL_LIMIT, reply_to=topic_id
+        ):
+            if message.date < oldest:
+                break
+            if getattr(message, "action", None) is None:
+                messages.append(message)
+
+        if messages:
+            info(f"Backfilling {len(messages)} missed messages for watcher {watcher_key}")
+        for message in reversed(messages):
+            await ingest_group_message(message, watch_entry)
 
     except Exception as e:
-        critical(f"ERROR in watcher task {watcher_key}: {str(e)}")
-        if client and client.is_connected():
-            info(f"Disconnecting client for failed watcher {watcher_key}")
-            await client.disconnect()
+        error(f"Error backfilling watcher {watcher_key}: {str(e)}")
     finally:
-        if client and client.is_connected():
-            await client.disconnect()
-        info(f"Watcher task {watcher_key} finished.")
+        held = backfilling.pop(watcher_key, [])
+        for event in held:
+            # Messages that arrived before iter_messages fetched them were already backfilled
+            if event.message.id <= last_message_ids.get(key, 0):
+                continue
+            await handle_group_message(event, user_id, group_id, topic_id)
+
+
+async def persist_last_message_ids():
+    """Write changed last processed message ids to their watch entries in one bulk write"""
+    if not dirty_message_ids:
+        return
+    keys = list(dirty_message_ids)
+    dirty_message_ids.clear()
+    operations = [
+        UpdateOne(
+            {"user_id": user_id, "group_id": group_id, "topic_id": topic_id},
+            {"$max": {"last_message_id": last_message_ids[(user_id, group_id, topic_id)]}},
+        )
+        for user_id, group_id, topic_id in keys
+    ]
+    try:
+        await db[WATCHED_GROUPS_COLLECTION].bulk_write(operations, ordered=False)
+    except Exception:
+        dirty_message_ids.update(keys)
+        raise
+
+
+async def persist_last_message_ids_loop():
+    while True:
+        await asyncio.sleep(LAST_MESSAGE_FLUSH_SECONDS)
+        try:
+            await persist_last_message_ids()
+        except Exception as e:
+            error(f"Error saving last message ids: {str(e)}")
+
+
+async def watch_key_links_loop():
+    """Keep the linked-key cache honest by evicting wallets that re-link their keys"""
+    while True:
+        try:
+            relinked = await async_poll_key_links()
+            if relinked:
+                debug(f"Evicted cached keys for {relinked} KeysLinked events")
+        except Exception as e:
+            error(f"Error polling KeysLinked events: {str(e)}")
+        await asyncio.sleep(KEY_LINK_POLL_SECONDS)
+
+
+async def get_sender_name(user_id: str, message) -> str:
+    """Resolve a message sender's display name, using the user's sender cache"""
+    cache = sender_caches.get(user_id)
+    if cache is None:
+        cache = sender_caches[user_id] = TTLCache(SENDER_CACHE_SIZE, SENDER_CACHE_TTL)
+
+    sender_id = message.sender_id
+    if sender_id is not None:
+        sender_name = cache.get(sender_id)
+        if sender_name is not None:
+            return sender_name
+
+    sender = await message.get_sender()
+    first_name = getattr(sender, "first_name", "") or ""
+    last_name = getattr(sender, "last_name", "") or ""
+    sender_name = f"{first_name} {last_name}"
+    sender_name = sender_name.strip() or getattr(sender, "username", None) or "Unknown"
+
+    if sender_id is not None:
+        cache.set(sender_id, sender_name)
+    return sender_name
+
+
+@app.get("/cache-stats")
+async def get_cache_stats():
+    return {
+        "sender": {
+            user_id: cache.stats() for user_id, cache in sender_caches.items()
+        },
+        "topics": topic_cache.stats(),
+        "llm": llm_cache_stats(),
+        "keys": key_cache.stats(),
+    }
 
 
 async def get_watch_entry(user_id: str, topic_id: int):
@@ -699,73 +1147,164 @@ async def get_watch_entry(user_id: str, topic_id: int):
 
 @app.get("/get-queue")
 async def get_queue():
-    global queue
-    return queue
+    """Stream the buffered windows as {key: [message, ...]} one window at a time"""
+
+    # Async so it runs on the event loop, never alongside appends and flushes to the rings
+    async def stream():
+        yield "{"
+        for i, key in enumerate(window_buffer.keys()):
+            messages = json.dumps(list(window_buffer.iter_window(key)))
+            yield f"{',' if i else ''}{json.dumps(key)}:{messages}"
+        yield "}"
+
+    return StreamingResponse(stream(), media_type="application/json")
+
+
+def window_key(group_id: int, topic_id: int = None) -> str:
+    """Key of the window shared by every user watching a group, or one topic of it"""
+    return str(group_id) if topic_id is None else f"{group_id}:{topic_id}"
+
+
+def shared_window_config(group_id: int, topic_id: int = None) -> dict:
+    """Settings of a shared window: the most responsive of its subscribers' settings"""
+    configs = [
+        get_window_config(watch_entry_cache[(user_id, group_id, topic_id)])
+        for user_id in window_subscribers.get(window_key(group_id, topic_id), ())
+        if (user_id, group_id, topic_id) in watch_entry_cache
+    ]
+    if not configs:
+        return get_window_config({})
+    size = min(config["size"] for config in configs)
+    return {
+        "size": size,
+        "seconds": min(config["seconds"] for config in configs),
+        "min_interval": min(config["min_interval"] for config in configs),
+        "overlap": min(max(config["overlap"] for config in configs), size - 1),
+    }
+
+
+def get_window_config(watch_entry: dict) -> dict:
+    """Windowing settings for a watched group, falling back to the global defaults"""
+
+    def setting(name, default):
+        value = watch_entry.get(name)
+        return default if value is None else value
+
+    size = max(1, setting("window_size", WINDOW_SIZE))
+    return {
+        "size": size,
+        "seconds": setting("window_seconds", WINDOW_SECONDS),
+        "min_interval": setting("min_analysis_interval", WINDOW_MIN_INTERVAL),
+        "overlap": min(setting("window_overlap", WINDOW_OVERLAP), size - 1),
+    }
+
+
+@app.get("/pipeline-stats")
+async def get_pipeline_stats():
+    return {
+        "dedup": deduplicator.stats(),
+        "prefilter": prefilter_stats,
+        "llm_usage": llm_usage_stats,
+        "llm_rate_limit": llm_rate_limit_stats(),
+        "llm_extraction": llm_extraction_stats,
+        "llm_backend": llm_fixture_stats(),
+        "analysis": analysis_scheduler.stats(),
+        "window_dropped": window_buffer.dropped,
+    }
 
 
 async def process_message(
-    group_name: str, topic_name: str, sender_name: str, message_text: str, user_id: str
+    key: str,
+    group_name: str,
+    topic_name: str,
+    sender_name: str,
+    message_text: str,
+    user_id: str,
+    window_config: dict = None,
 ):
-    global queue
-
-    key = f"{group_name}:{topic_name}" if topic_name is not None else group_name
-
-    queue[key] = queue.get(key, [])
-    queue[key].append(
-        {
-            "group_name": group_name,
-            "topic_name": topic_name,
-            "sender_name": sender_name,
-            "message_text": message_text,
-            "user_id": user_id,
-            "overlap": False,
-        }
+    config = window_config or get_window_config({})
+
+    # Windows are shared, so user_id is just whichever subscriber's client claimed the message
+    dedup_key = "global" if DEDUP_SCOPE == "global" else key
+    if deduplicator.is_duplicate(dedup_key, message_text):
+        debug(f"Suppressed duplicate message in {key}")
+        return
+
+    size = window_buffer.append(
+        key, group_name, topic_name, user_id, sender_name, message_text
     )
-    # print("Message received:", message_text)
-    # print("Queue:", queue)
-    if len(queue[key]) == 10:
-        last_10_messages = queue[key]
-        queue[key] = []
-        overlap_messages = last_10_messages[-3:]
-        for message in overlap_messages:
-            message["overlap"] = True
-            queue[key].append(message)
-        asyncio.create_task(analyse_texts(last_10_messages, user_id))
-
-
-def generate(prompt: str):
-    max_retries = 3
-    retry_count = 0
-    
-    while retry_count < max_retries:
-        try:
-            client = Groq(
-                api_key=os.getenv("GROQ_API_KEY"),
-            )
-            response = client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model=os.getenv("GROQ_MODEL"),
-                stream=False,
-            )
-            output = response.choices[0].message.content
-            output = output.split("</think>")[1]
-            return output
-            
-        except Exception as e:
-            retry_count += 1
-            if retry_count == max_retries:
-                raise Exception(f"Failed after {max_retries} retries: {str(e)}")
-            debug(f"Attempt {retry_count} failed, retrying...")
+
+    state = window_state.setdefault(
+        key, {"last_analysis": 0.0, "timer": None, "due": None}
+    )
+    state["config"] = config
+
+    # Flush on N messages or T seconds after the window opened, whichever comes first
+    if size >= config["size"]:
+        request_window_flush(key)
+    else:
+        schedule_window_flush(key, config["seconds"])
+
+
+def resume_restored_windows():
+    """Arm flush timers for windows replayed from the spill log, now that their subscribers are known"""
+    for key in window_buffer.keys():
+        if key in window_state or window_buffer.pending(key) == 0:
+            continue
+        group_id, _, topic_id = key.partition(":")
+        config = shared_window_config(int(group_id), int(topic_id) if topic_id else None)
+        window_state[key] = {"last_analysis": 0.0, "timer": None, "due": None, "config": config}
+        schedule_window_flush(key, config["seconds"])
+
+
+def request_window_flush(key: str):
+    """Flush a window now, or once its minimum analysis interval has elapsed"""
+    state = window_state[key]
+    wait = state["last_analysis"] + state["config"]["min_interval"] - time.monotonic()
+    if wait > 0:
+        schedule_window_flush(key, wait)
+        return
+    flush_window(key)
+
+
+def schedule_window_flush(key: str, delay: float):
+    """Arrange a flush after `delay` seconds unless an earlier one is already pending"""
+    state = window_state[key]
+    due = time.monotonic() + delay
+    timer = state["timer"]
+    if timer and not timer.done():
+        if state["due"] <= due:
+            return
+        timer.cancel()
+    state["due"] = due
+    state["timer"] = asyncio.create_task(flush_window_after(key, delay))
+
+
+async def flush_window_after(key: str, delay: float):
+    await asyncio.sleep(delay)
+    window_state[key]["timer"] = None
+    request_window_flush(key)
+
+
+def flush_window(key: str):
+    """Hand a window's messages to analysis, keeping the configured overlap"""
+    state = window_state[key]
+    if state["timer"] and not state["timer"].done():
+        state["timer"].cancel()
+    state["timer"] = None
+
+    if window_buffer.pending(key) == 0:
+        return
+
+    messages = window_buffer.flush(key, overlap=state["config"]["overlap"])
+    state["last_analysis"] = time.monotonic()
+    # Fair queueing is per group, so one busy chat cannot starve the others
+    analysis_scheduler.submit(key.split(":")[0], key, messages)
 
 
 async def get_eth_balance(user_id: str) -> bool:
     debug(f"Getting ETH balance for user {user_id}")
-    balance = edu_balance(user_id)["edu_balance"]
+    balance = (await async_edu_balance(user_id))["edu_balance"]
     if balance > 0:
         await log_action(
             "Check EDU Balance", "Check EDU Balance", {
@@ -779,7 +1318,7 @@ async def get_eth_balance(user_id: str) -> bool:
 
 async def get_token_balance(token: str, user_id: str) -> bool:
     debug(f"Getting token balance for user {user_id} and token {token}")
-    balance = token_balance(user_id, token)["token_balance"]
+    balance = (await async_token_balance(user_id, token))["token_balance"]
     if balance > 0:
         await log_action(
             "Check Token Balance", token, {
@@ -815,70 +1354,177 @@ async def log_action(action: str, input_data: Any, output_data: Any, user_id: st
         error(f"Error logging action: {str(e)}")
 
 
-async def analyse_texts(queue: List[Dict], user_id: str) -> Any:
+async def analyse_window(queue: List[Dict], key: str):
+    """Analyse a flushed window once on behalf of every user currently watching it"""
+    user_ids = sorted(window_subscribers.get(key, ()))
+    if not user_ids:
+        debug(f"No subscribers left for window {key}, skipping analysis")
+        return
+    return await analyse_texts(queue, user_ids)
+
+
+def user_queue(queue: List[Dict], user_id: str) -> List[Dict]:
+    """A shared window's messages as logged for one of its subscribers"""
+    return [{**message, "user_id": user_id} for message in queue]
+
+
+async def analyse_texts(queue: List[Dict], user_ids: List[str]) -> Any:
     debug("Analyzing texts")
-    tg_alpha = get_alpha(queue)
-    await log_action("Get Alpha from Group Texts", queue, tg_alpha, user_id)
+    candidates = None
+    if TICKER_PREFILTER:
+        prefilter_stats["windows"] += 1
+        candidates = ticker_matcher.find_all(message["message_text"] for message in queue)
+        if not candidates:
+            prefilter_stats["skipped"] += 1
+            debug("No tradable token mentioned in window, skipping alpha extraction")
+            return
+    if LLM_STREAMING:
+        return await analyse_texts_streaming(queue, user_ids, candidates)
+
+    tg_alpha = await get_alpha(queue, candidates)
+    for user_id in user_ids:
+        await log_action("Get Alpha from Group Texts", user_queue(queue, user_id), tg_alpha, user_id)
+        if len(tg_alpha) == 0:
+            await log_action("Analyse Texts", tg_alpha, "No token alphas detected", user_id)
     if len(tg_alpha) == 0:
-        await log_action("Analyse Texts", tg_alpha, "No token alphas detected", user_id)
         return
-    for token in tg_alpha:
-        await log_action("Analyse Each Alpha", token, "Analyzing alpha", user_id)
-        if token["sentiment"] == "positive":
+
+    # Balance checks first, so only alphas some subscriber can act on are validated
+    holders = await asyncio.gather(*[eligible_users(token, user_ids) for token in tg_alpha])
+    eligible = {
+        user_id: [token for token, users in zip(tg_alpha, holders) if user_id in users]
+        for user_id in user_ids
+    }
+    actionable = [token for token, users in zip(tg_alpha, holders) if users]
+
+    validations = await fetch_validations(actionable)
+
+    async def act_for_user(user_id):
+        for token in eligible[user_id]:
+            await act_on_alpha(token, user_id, validations.get(token["token"].upper()))
+
+    results = await asyncio.gather(*[act_for_user(user_id) for user_id in user_ids], return_exceptions=True)
+    for user_id, result in zip(user_ids, results):
+        if isinstance(result, Exception):
+            error(f"Error acting on alphas for user {user_id}: {str(result)}")
+
+
+async def analyse_texts_streaming(queue: List[Dict], user_ids: List[str], candidates: List[str] = None):
+    """Stream get_alpha and start each alpha's balance, validation and trust checks as it arrives"""
+    tg_alpha = []
+    tasks = []
+
+    async def process_alpha(token):
+        eligible = await eligible_users(token, user_ids)
+        if not eligible:
+            return
+        try:
+            validation = await get_tweets_and_sentiment(token)
+        except Exception as e:
+            error(f"Error validating token {token['token']}: {str(e)}")
+            validation = None
+        await asyncio.gather(*[act_on_alpha(token, user_id, validation) for user_id in eligible])
+
+    stream_error = None
+    try:
+        async for token in get_alpha_stream(queue, candidates):
+            tg_alpha.append(token)
+            tasks.append(asyncio.create_task(process_alpha(token)))
+    except Exception as e:
+        stream_error = e
+        error(f"Alpha stream failed after {len(tg_alpha)} alphas: {str(e)}")
+
+    # Alphas that arrived before a failed stream are still logged and acted on
+    for user_id in user_ids:
+        if tg_alpha or stream_error is None:
+            await log_action("Get Alpha from Group Texts", user_queue(queue, user_id), tg_alpha, user_id)
+        if not tg_alpha and stream_error is None:
+            await log_action("Analyse Texts", tg_alpha, "No token alphas detected", user_id)
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for token, result in zip(tg_alpha, results):
+        if isinstance(result, Exception):
+            error(f"Error processing alpha {token.get('token')}: {str(result)}")
+    if stream_error is not None:
+        raise stream_error
+
+
+async def eligible_users(token: Dict, user_ids: List[str]) -> List[str]:
+    """Subscribers able to act on an alpha, checked concurrently; a failed check only excludes that user"""
+    checks = await asyncio.gather(
+        *[check_alpha_balance(token, user_id) for user_id in user_ids], return_exceptions=True
+    )
+    eligible = []
+    for user_id, check in zip(user_ids, checks):
+        if isinstance(check, Exception):
+            error(f"Error checking balance for user {user_id} and token {token.get('token')}: {str(check)}")
+        elif check:
+            eligible.append(user_id)
+    return eligible
+
+
+async def check_alpha_balance(token: Dict, user_id: str) -> bool:
+    """Whether the user holds what this alpha would trade: EDU to buy, the token to sell"""
+    await log_action("Analyse Each Alpha", token, "Analyzing alpha", user_id)
+    if token["sentiment"] == "positive":
+        await log_action(
+            "Check EDU Balance [Alpha is positive so we need to buy using EDU]",
+            token,
+            "Checking EDU balance",
+            user_id
+        )
+        if not await get_eth_balance(user_id):
             await log_action(
-                "Check EDU Balance [Alpha is positive so we need to buy using EDU]",
-                token,
-                "Checking EDU balance",
-                user_id
+                "Check EDU Balance", token, "EDU balance is zero", user_id
             )
-            if not get_eth_balance(user_id):
-                await log_action(
-                    "Check EDU Balance", token, "EDU balance is zero", user_id
-                )
-                return
-        elif token["sentiment"] == "negative":
-            await log_action(
-                "Check Token Balance [Alpha is negative so we need to sell the token]",
-                token,
-                "Checking token balance",
-                user_id
+            return False
+    elif token["sentiment"] == "negative":
+        await log_action(
+            "Check Token Balance [Alpha is negative so we need to sell the token]",
+            token,
+            "Checking token balance",
+            user_id
 
+        )
+        if not await get_token_balance(token["token"], user_id):
+            await log_action(
+                "Check Token Balance", token, "Token balance is zero", user_id
             )
-            if not get_token_balance(token["token"], user_id):
-                await log_action(
-                    "Check Token Balance", token, "Token balance is zero", user_id
-                )
-                return
-        _, sentiment, valid = await validation_layer(token, user_id)
-        if not valid:
-            await log_action("Validation Layer Declined", token, {
-                "reason": "Token is not valid",
-                "sentiment": sentiment,
-                "validity": valid,
-            }, user_id)
-            return
-        trust, pnl_potential = await trust_layer(sentiment, token, user_id)
-        if not trust:
-            await log_action("Trust Layer Declined", {
-                "token": token,
-                "sentiment": sentiment
-            }, {
-                "reason": "Token is not trusted",
-                "trust": trust,
-                "pnl_potential": pnl_potential,
-            },
-            user_id)
-            return
-        else:
-            await log_action("Trust Layer Approved", {
-                "token": token,
-                "sentiment": sentiment
-            }, {
-                "trust_validity": trust,
-                "pnl_potential": pnl_potential,
-            }, user_id)
-        await transaction_layer(token, user_id)
-    return
+            return False
+    return True
+
+
+async def act_on_alpha(token: Dict, user_id: str, validation: Tuple[List[str], str] = None):
+    """Run an alpha through the validation and trust layers, trading if both approve"""
+    _, sentiment, valid = await validation_layer(token, user_id, validation)
+    if not valid:
+        await log_action("Validation Layer Declined", token, {
+            "reason": "Token is not valid",
+            "sentiment": sentiment,
+            "validity": valid,
+        }, user_id)
+        return
+    trust, pnl_potential = await trust_layer(sentiment, token, user_id)
+    if not trust:
+        await log_action("Trust Layer Declined", {
+            "token": token,
+            "sentiment": sentiment
+        }, {
+            "reason": "Token is not trusted",
+            "trust": trust,
+            "pnl_potential": pnl_potential,
+        },
+        user_id)
+        return
+    else:
+        await log_action("Trust Layer Approved", {
+            "token": token,
+            "sentiment": sentiment
+        }, {
+            "trust_validity": trust,
+            "pnl_potential": pnl_potential,
+        }, user_id)
+    await transaction_layer(token, user_id)
 
 
 @app.get("/get-logs/{user_id}")
@@ -934,9 +1580,19 @@ async def get_token_history(user_id: str) -> List[str]:
 @app.get("/get-token-history/{user_id}")
 async def get_token_history_endpoint(user_id: str):
     tokens = await get_token_history(user_id)
+    # One batched read for the whole portfolio; tokens no longer registered get no balance
+    known = [token for token in tokens if token.upper() == "EDU" or token.upper() in token_registry]
+    wallet = (await async_bulk_balances([user_id], known))[user_id] if known else None
     res = []
     for token in tokens:
-        balance = token_balance(user_id, token)
+        balance = None
+        if token in known:
+            balance = {
+                "public_key": wallet["public_key"],
+                "private_key": wallet["private_key"],
+                "token_balance": wallet["balances"][token.upper()],
+                "token_ticker": token.upper(),
+            }
         res.append({"token": token, "balance": balance})
     return res
 
@@ -956,12 +1612,12 @@ async def transaction_layer(token: Dict, user_id: str):
 
         if token["sentiment"] == "positive":
             try:
-                balance = edu_balance(user_id)["edu_balance"]
+                balance = (await async_edu_balance(user_id))["edu_balance"]
                 info(f"EDU balance for user {user_id}: {balance}")
                 
                 if balance > 0:
                     try:
-                        tx = buy_token(user_id, token["token"], balance * 0.6)
+                        tx = await async_buy_token(user_id, token["token"], balance * 0.6)
                         info(f"Successfully bought {token['token']} for user {user_id}")
                         await log_action(f"Buy Token {token['token']}", token, tx, user_id)
                     except Exception as e:
@@ -987,12 +1643,12 @@ async def transaction_layer(token: Dict, user_id: str):
 
         elif token["sentiment"] == "negative":
             try:
-                balance = token_balance(user_id, token["token"])["token_balance"]
+                balance = (await async_token_balance(user_id, token["token"]))["token_balance"]
                 info(f"Token balance for {token['token']} and user {user_id}: {balance}")
                 
                 if balance > 0:
                     try:
-                        tx = sell_token(user_id, token["token"], balance)
+                        tx = await async_sell_token(user_id, token["token"], balance)
                         info(f"Successfully sold {token['token']} for user {user_id}")
                         await log_action(f"Sell Token {token['token']}", token, tx, user_id)
                     except Exception as e:
@@ -1153,12 +1809,15 @@ async def trust_layer(sentiment: str, token: Dict, user_id: str) -> Tuple[bool,
     return True, pnl_potential
 
 
-def get_tweets(token: Dict) -> List[Dict]:
-    good_bad = (
-        "good"
-        if random.random() < (0.8 if token["sentiment"] == "positive" else 0.2)
-        else "bad"
+async def get_tweets(token: Dict) -> List[Dict]:
+    prompt = build_tweets_prompt(token["token"], tweet_sentiment_target(token))
+    response = await generate(
+        prompt, cache_ttl=TWEETS_CACHE_TTL, call_site="get_tweets", schema=TweetsResponse
     )
+    return response["tweets"]
+
+
+def build_tweets_prompt(token: str, good_bad: str) -> str:
     prompt = f"""You are an expert crypto token tweet generator. You are given a token name and you need to generate 10 tweets about the token. Sentiment of the tweets should be {good_bad}.
     The tweets should be short and to the point, max 280 characters each.
     The tweets should be engaging and interesting, and not be promotional.
@@ -1174,13 +1833,22 @@ def get_tweets(token: Dict) -> List[Dict]:
             ...
         ]
     }}
-    Token name: {token["token"]}
+    Token name: {token}
     """
-    response = generate(prompt)
-    return from_json(response, allow_inf_nan=True, allow_partial=True)["tweets"]
+    return prompt
+
+
+async def analyse_tweets(tweets: List[str], token: str) -> Dict:
+    prompt = build_tweet_analysis_prompt(tweets, token)
+    return await generate(
+        prompt,
+        cache_ttl=TWEET_ANALYSIS_CACHE_TTL,
+        call_site="analyse_tweets",
+        schema=TweetSentimentResponse,
+    )
 
 
-def analyse_tweets(tweets: List[str], token: str) -> Dict:
+def build_tweet_analysis_prompt(tweets: List[str], token: str) -> str:
     prompt = f"""You are an expert cryptocurrency analyst with deep experience in sentiment analysis and market psychology. You are given a list of tweets discussing a specific token.
 
     Your task is to carefully analyze these tweets to determine the overall market sentiment. Consider:
@@ -1205,14 +1873,134 @@ def analyse_tweets(tweets: List[str], token: str) -> Dict:
     Tweets to analyze: {tweets}
     Token being discussed: {token}
     """
-    response = generate(prompt)
-    return from_json(response, allow_inf_nan=True, allow_partial=True)
+    return prompt
+
+
+def tweet_sentiment_target(token: Dict) -> str:
+    return (
+        "good"
+        if random.random() < (0.8 if token["sentiment"] == "positive" else 0.2)
+        else "bad"
+    )
+
 
+async def get_tweets_and_sentiment_batch(alphas: List[Dict]) -> Dict[str, Tuple[List[str], str]]:
+    """Tweets and sentiment for several tokens: per-token cache hits first, the misses in one LLM call
 
-async def validation_layer(alpha: Dict, user_id: str) -> Tuple[List[str], Dict, bool]:
-    tweets = get_tweets(alpha)
+    Batched results are cached under the get_tweets and analyse_tweets prompts,
+    so a hot token costs one call per TTL whichever tokens it shows up with.
+    Tokens missing from the result are left to the caller.
+    """
+    targets = {alpha["token"].upper(): (alpha, tweet_sentiment_target(alpha)) for alpha in alphas}
+    hits = {}
+    misses = []
+    for token, (alpha, good_bad) in targets.items():
+        response = await cached_output(
+            build_tweets_prompt(alpha["token"], good_bad), TweetsResponse, call_site="get_tweets"
+        )
+        if response is None:
+            misses.append(token)
+        else:
+            hits[token] = response["tweets"]
+
+    results = {}
+    # The analysis of cached tweets is usually cached as well
+    analyses = await asyncio.gather(
+        *[analyse_tweets(tweets, targets[token][0]["token"]) for token, tweets in hits.items()],
+        return_exceptions=True,
+    )
+    for (token, tweets), analysis in zip(hits.items(), analyses):
+        if not isinstance(analysis, Exception):
+            results[token] = (tweets, analysis["sentiment"])
+
+    if len(misses) < 2:
+        return results
+    # Sorted, so the same misses always make the same prompt
+    prompt = build_validation_batch_prompt(
+        [(targets[token][0]["token"], targets[token][1]) for token in sorted(misses)]
+    )
+    response = await generate(prompt, call_site="validate_batch", schema=ValidationBatchResponse)
+    for entry in response["tokens"]:
+        token = entry["token"].upper()
+        if token not in misses or not entry["tweets"]:
+            continue
+        alpha, good_bad = targets[token]
+        results[token] = (entry["tweets"], entry["sentiment"])
+        await cache_output(
+            build_tweets_prompt(alpha["token"], good_bad), {"tweets": entry["tweets"]}, TWEETS_CACHE_TTL
+        )
+        await cache_output(
+            build_tweet_analysis_prompt(entry["tweets"], alpha["token"]),
+            {"sentiment": entry["sentiment"]},
+            TWEET_ANALYSIS_CACHE_TTL,
+        )
+    return results
+
+
+def build_validation_batch_prompt(targets: List[Tuple[str, str]]) -> str:
+    """Batched tweet prompt for (token, "good"/"bad") pairs"""
+    tokens = "\n".join(
+        f"- {token}: tweet sentiment should be {good_bad}" for token, good_bad in targets
+    )
+    prompt = f"""You are an expert crypto token tweet generator and cryptocurrency sentiment analyst. For each token below, generate 10 tweets about the token with the given sentiment, then analyse those tweets as a skeptical analyst would to decide the overall market sentiment.
+    The tweets should be short and to the point, max 280 characters each.
+    The tweets should be engaging and interesting, and not be promotional.
+    Some tweets should be weird and funny.
+    One or two tweets can be opposite of the overall sentiment, to make it more interesting, but not more than 2.
+    All tweets should be about the token itself, not the project behind it.
+    Make sure all the tweets are in English or Hindi.
+    When analysing, weigh tone, criticism or praise, price and volume talk, credibility, and watch for coordinated pumping, FUD and manipulation.
+    Return one entry per token in this JSON format:
+    {{
+        "tokens": [
+            {{
+                "token": "token_symbol",
+                "tweets": ["tweet 1", "tweet 2", ...],
+                "sentiment": "positive/negative"
+            }},
+            ...
+        ]
+    }}
+    Tokens:
+{tokens}
+    """
+    return prompt
+
+
+async def get_tweets_and_sentiment(alpha: Dict) -> Tuple[List[str], str]:
+    tweets = await get_tweets(alpha)
+    sentiment = (await analyse_tweets(tweets, alpha["token"]))["sentiment"]
+    return tweets, sentiment
+
+
+async def fetch_validations(alphas: List[Dict]) -> Dict[str, Tuple[List[str], str]]:
+    """Tweets and sentiment for every alpha: cached or batched when possible, otherwise concurrently per token"""
+    results = {}
+    if VALIDATION_BATCH and len(alphas) > 1:
+        try:
+            results = await get_tweets_and_sentiment_batch(alphas)
+        except Exception as e:
+            error(f"Batched validation failed, validating tokens individually: {str(e)}")
+
+    missing = [alpha for alpha in alphas if alpha["token"].upper() not in results]
+    fetched = await asyncio.gather(
+        *[get_tweets_and_sentiment(alpha) for alpha in missing], return_exceptions=True
+    )
+    for alpha, result in zip(missing, fetched):
+        if isinstance(result, Exception):
+            error(f"Error validating token {alpha['token']}: {str(result)}")
+            continue
+        results[alpha["token"].upper()] = result
+    return results
+
+
+async def validation_layer(
+    alpha: Dict, user_id: str, validation: Tuple[List[str], str] = None
+) -> Tuple[List[str], Dict, bool]:
+    if validation is None:
+        validation = await get_tweets_and_sentiment(alpha)
+    tweets, sentiment = validation
     await log_action("Get Tweets", alpha, tweets, user_id)
-    sentiment = analyse_tweets(tweets, alpha["token"])["sentiment"]
     await log_action("Analyse Tweets", {
         "token": alpha["token"],
         "tweets": tweets,
@@ -1232,7 +2020,12 @@ async def validation_layer(alpha: Dict, user_id: str) -> Tuple[List[str], Dict,
     return tweets, sentiment, True
 
 
-def get_alpha(queue: List[Dict]):
+def build_alpha_prompt(queue: List[Dict], candidates: List[str] = None) -> str:
+    candidate_note = (
+        f"\n\nOnly these tradable tokens matter here; ignore any other token: {', '.join(candidates)}"
+        if candidates
+        else ""
+    )
     prompt = f"""You are an expect cryptocurrency analyst with deep knowledge of tokens, DeFi protocols, and market trends. Analyze the following group chat messages and:
 
 1. Identify any cryptocurrency tokens being discussed, including:
@@ -1248,7 +2041,7 @@ def get_alpha(queue: List[Dict]):
      * Market outlook
      * User reactions
 
-3. If the messages are overlap message, only take them into account if they are relevant to the non-overlap messages.
+3. If the messages are overlap message (marked with [overlap]), only take them into account if they are relevant to the non-overlap messages.
 
 3. Return results in this JSON format:
 [
@@ -1261,130 +2054,105 @@ def get_alpha(queue: List[Dict]):
     ...
 ]
 
-Return empty list if no tokens detected.
+Return empty list if no tokens detected.{candidate_note}
+
+Messages to analyze, one per line as "sender: text":
+{encode_window(queue)}"""
+    return prompt
+
+
+async def get_alpha(queue: List[Dict], candidates: List[str] = None):
+    prompt = build_alpha_prompt(queue, candidates)
+    alphas, usage = await generate_with_usage(prompt, call_site="get_alpha", schema=List[Alpha])
+    if queue:
+        info(
+            f"get_alpha for {queue[0]['group_name']}:{queue[0]['topic_name']} ({len(queue)} messages): "
+            f"{usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion tokens "
+            f"in {usage['latency']:.2f}s"
+        )
+    return alphas
 
-Messages to analyze: {queue}"""
-    response = generate(prompt)
-    return from_json(response, allow_inf_nan=True, allow_partial=True)
+
+async def get_alpha_stream(queue: List[Dict], candidates: List[str] = None):
+    """Yield each alpha object as soon as the model has finished writing it"""
+    prompt = build_alpha_prompt(queue, candidates)
+    async for alpha in stream_json_array(prompt, call_site="get_alpha", schema=Alpha):
+        yield alpha
+
+
+def encode_window(queue: List[Dict]) -> str:
+    """Compact prompt form of a window: shared fields once, then one line per message"""
+    if not queue:
+        return ""
+    header = f"Group: {queue[0]['group_name']}"
+    if queue[0]["topic_name"] is not None:
+        header += f" | Topic: {queue[0]['topic_name']}"
+    lines = [header]
+    for message in queue:
+        text = " / ".join((message["message_text"] or "").splitlines())
+        marker = "[overlap] " if message["overlap"] else ""
+        lines.append(f"{marker}{message['sender_name']}: {text}")
+    return "\n".join(lines)
 
 
 @app.get("/user-groups/{user_id}")
 async def get_user_groups(user_id: str):
     try:
-        user = await db[COLLECTION_NAME].find_one({"user_id": user_id})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not registered")
-
-        session = decrypt_data(user["session_string"])
-        client = TelegramClient(
-            StringSession(session), user["api_id"], decrypt_data(user["api_hash"])
-        )
+        client = await get_user_client(user_id)
+
+        # Merge the latest dialogs so newly joined groups show up before the index expires
+        index = await refresh_entity_index(user_id, client)
+        dialogs = list(index["dialogs"].values())
+
+        regular_groups = []
+        super_groups = []
+        channels = []
+
+        for dialog in dialogs:
+            if getattr(
+                    dialog.entity, "participants_count", None
+                ) is None or getattr(dialog.entity, "participants_count", None) < 1:
+                continue
+            group_info = {
+                "id": getattr(dialog.entity, "id", None),
+                "title": dialog.title,
+                "participants_count": getattr(
+                    dialog.entity, "participants_count", None
+                ),
+                "username": getattr(dialog.entity, "username", None),
+                "description": getattr(dialog.entity, "about", None),
+            }
 
-        try:
-            await client.connect()
-            if not await client.is_user_authorized():
-                raise HTTPException(status_code=401, detail="Session expired")
-
-            dialogs = await client.get_dialogs()
-
-            regular_groups = []
-            super_groups = []
-            channels = []
-            dialog_dict = {}
-            for key, value in dialogs[0].__dict__.items():
-                if hasattr(value, "__dict__"):
-                    nested_dict = {}
-                    for k, v in value.__dict__.items():
-                        if isinstance(v, StringSession):
-                            continue
-                        elif hasattr(v, "__dict__"):
-                            nested_dict[k] = str(v)
-                        elif isinstance(v, datetime):
-                            nested_dict[k] = v.isoformat()
-                        else:
-                            nested_dict[k] = str(v)
-                    dialog_dict[key] = nested_dict
-                elif isinstance(value, datetime):
-                    dialog_dict[key] = value.isoformat()
-                elif isinstance(value, StringSession):
-                    continue
+            if dialog.is_channel:
+                if getattr(dialog.entity, "megagroup", False):
+                    group_info["type"] = "supergroup"
+                    super_groups.append(group_info)
                 else:
-                    dialog_dict[key] = str(value)
-
-            for dialog in dialogs:
-                if getattr(
-                        dialog.entity, "participants_count", None
-                    ) is None or getattr(dialog.entity, "participants_count", None) < 1:
-                    continue
-                group_info = {
-                    "id": getattr(dialog.entity, "id", None),
-                    "title": dialog.title,
-                    "participants_count": getattr(
-                        dialog.entity, "participants_count", None
-                    ),
-                    "username": getattr(dialog.entity, "username", None),
-                    "description": getattr(dialog.entity, "about", None),
-                }
-
-                if dialog.is_channel:
-                    if getattr(dialog.entity, "megagroup", False):
-                        group_info["type"] = "supergroup"
-                        super_groups.append(group_info)
-                    else:
-                        group_info["type"] = "channel"
-                        channels.append(group_info)
-                elif dialog.is_group:
-                    group_info["type"] = "group"
-                    regular_groups.append(group_info)
-
-            for group in super_groups:
-                try:
-                    entity = await client.get_entity(group["id"])
-                    if getattr(entity, "forum", False):
-                        topics = await client(
-                            functions.channels.GetForumTopicsRequest(
-                                channel=entity,
-                                offset_date=0,
-                                offset_id=0,
-                                offset_topic=0,
-                                limit=100,
-                            )
-                        )
+                    group_info["type"] = "channel"
+                    channels.append(group_info)
+            elif dialog.is_group:
+                group_info["type"] = "group"
+                regular_groups.append(group_info)
 
-                        group["is_forum"] = True
-                        group["topics"] = []
-
-                        for topic in topics.topics:
-                            group["topics"].append(
-                                {
-                                    "id": topic.id,
-                                    "title": topic.title,
-                                    "icon_color": (
-                                        topic.icon_color
-                                        if hasattr(topic, "icon_color")
-                                        else None
-                                    ),
-                                    "icon_emoji": (
-                                        topic.icon_emoji
-                                        if hasattr(topic, "icon_emoji")
-                                        else None
-                                    ),
-                                }
-                            )
-                    else:
-                        group["is_forum"] = False
-                except Exception as e:
+        async def add_topics(group):
+            try:
+                entity = index["dialogs"][group["id"]].entity
+                if getattr(entity, "forum", False):
+                    group["is_forum"] = True
+                    group["topics"] = await get_forum_topics(user_id, client, entity)
+                else:
                     group["is_forum"] = False
-                    group["topics_error"] = str(e)
+            except Exception as e:
+                group["is_forum"] = False
+                group["topics_error"] = str(e)
 
-            return {
-                "regular_groups": regular_groups if len(regular_groups) > 0 else [],
-                "supergroups": super_groups if len(super_groups) > 0 else [],
-                "channels": channels if len(channels) > 0 else [],
-            }
+        await asyncio.gather(*[add_topics(group) for group in super_groups])
 
-        finally:
-            await client.disconnect()
+        return {
+            "regular_groups": regular_groups if len(regular_groups) > 0 else [],
+            "supergroups": super_groups if len(super_groups) > 0 else [],
+            "channels": channels if len(channels) > 0 else [],
+        }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1460,8 +2228,6 @@ async def send_message(
         return {"status": "Message sent"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        await client.disconnect()
 
 
 @app.get("/")
@@ -1475,7 +2241,8 @@ async def root():
             "auth": ["/init-user", "/verify-otp"],
             "groups": ["/watched-groups/{user_id}", "/watch-group", "/unwatch-group"],
             "messages": ["/send-message"],
-            "data": ["/get-logs/{user_id}", "/get-token-history/{user_id}", "/get-queue"]
+            "data": ["/get-logs/{user_id}", "/get-token-history/{user_id}", "/get-queue", "/cache-stats", "/pipeline-stats"],
+            "health": ["/ready"]
         },
         "health": {
             "ping": "pong",
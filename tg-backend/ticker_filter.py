@@ -0,0 +1,85 @@
+import json
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+class TickerMatcher:
+    """Aho-Corasick matcher for tickers, cashtags and aliases of the tradable tokens
+
+    Matching is case-insensitive and only counts whole words, so "ALT" matches
+    "$ALT" and "alt!" but not "alternative".
+    """
+
+    def __init__(self, aliases: Dict[str, Iterable[str]]):
+        # Trie as parallel lists: goto transitions, failure links, outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[tuple]] = [[]]
+
+        for symbol, names in aliases.items():
+            for name in {symbol, *names}:
+                self._add(name.lower(), symbol.upper())
+        self._build()
+
+    def _add(self, pattern: str, symbol: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(pattern), symbol))
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find(self, text: str) -> Set[str]:
+        """Symbols mentioned in `text`"""
+        found = set()
+        if not text:
+            return found
+        text = text.lower()
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, symbol in self._out[state]:
+                start = end - length + 1
+                before = text[start - 1] if start > 0 else " "
+                after = text[end + 1] if end + 1 < len(text) else " "
+                if not before.isalnum() and not after.isalnum():
+                    found.add(symbol)
+        return found
+
+    def find_all(self, texts: Iterable[str]) -> List[str]:
+        """Symbols mentioned anywhere in `texts`, sorted"""
+        found = set()
+        for text in texts:
+            found |= self.find(text)
+        return sorted(found)
+
+
+def load_aliases(symbols: Iterable[str], path: str = None) -> Dict[str, List[str]]:
+    """Tradable symbols with any configured aliases from a {"SYMBOL": ["alias", ...]} JSON file"""
+    aliases = {symbol.upper(): [] for symbol in symbols}
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            for symbol, names in json.load(f).items():
+                if symbol.upper() in aliases:
+                    aliases[symbol.upper()].extend(names)
+    return aliases
@@ -1,11 +1,29 @@
+import asyncio
 import json
+import logging
 import os
-from web3 import Web3
+from decimal import Decimal
+from typing import Dict, List
+from aiohttp import ClientSession, TCPConnector
+from web3 import AsyncWeb3, Web3
+from web3.exceptions import TimeExhausted
 from dotenv import load_dotenv
 from eth_account import Account
 
+from cache import TTLCache
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+KEY_CACHE_SIZE = int(os.getenv("KEY_CACHE_SIZE", 1024))
+KEY_CACHE_TTL = int(os.getenv("KEY_CACHE_TTL", 600))
+TOKENS_CONFIG_PATH = os.getenv("TOKENS_CONFIG_PATH", "tokens.json")
+BALANCE_FETCH_CONCURRENCY = int(os.getenv("BALANCE_FETCH_CONCURRENCY", 8))
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", 20))
+# Most blocks scanned per KeysLinked get_logs request
+KEY_LINK_SCAN_BLOCKS = int(os.getenv("KEY_LINK_SCAN_BLOCKS", 5000))
+
 with open("abi.json", "r") as f:
     abi = json.load(f)
 
@@ -13,20 +31,85 @@ contract_address = "0x8fF00cED35C26EA1dC89F8B730F7949aC15F4116"
 w3 = Web3(Web3.HTTPProvider(os.getenv("RPC_URL")))
 contract = w3.eth.contract(address=contract_address, abi=abi)
 
+# Non-blocking counterparts for use from the event loop
+aw3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(os.getenv("RPC_URL")))
+async_contract = aw3.eth.contract(address=contract_address, abi=abi)
+_async_session: ClientSession = None
+
+
+def load_token_registry(path: str) -> Dict[str, dict]:
+    """Tradable tokens from a {"TICKER": {"address", "abi", "decimals", "buy", "sell", "sell_gas"}} config
+
+    `abi` is the token's ABI file and `buy`/`sell` name its payable buy and
+    its sell(amount) functions (`sell` may be null for tokens that cannot be
+    sold). The optional `sell_gas` is the gas limit of a sell broadcast before
+    its approve is mined. ABIs are read and contract objects built once, here.
+    """
+    with open(path, "r") as f:
+        config = json.load(f)
+
+    registry = {}
+    for ticker, entry in config.items():
+        with open(entry["abi"], "r") as f:
+            token_abi = json.load(f)
+        registry[ticker.upper()] = {
+            "ticker": ticker.upper(),
+            "address": entry["address"],
+            "abi": token_abi,
+            "decimals": entry.get("decimals", 18),
+            "buy": entry["buy"],
+            "sell": entry.get("sell"),
+            "sell_gas": entry.get("sell_gas"),
+            "contract": w3.eth.contract(address=entry["address"], abi=token_abi),
+            "async_contract": aw3.eth.contract(address=entry["address"], abi=token_abi),
+        }
+    return registry
 
-def edu_balance(address: str):
-    private_key = os.getenv("PRIVATE_KEY")
-    if not private_key:
-        raise ValueError("Private key not found in environment variables")
 
-    account = Account.from_key(private_key)
+token_registry = load_token_registry(TOKENS_CONFIG_PATH)
+token_addresses = {ticker: token["address"] for ticker, token in token_registry.items()}
+
+# wallet address (lowercase) -> (public key, private key) linked on the contract
+key_cache = TTLCache(KEY_CACHE_SIZE, KEY_CACHE_TTL)
+# Last block scanned for KeysLinked events; None until the first poll
+key_link_block = None
+_operator = None
+
+
+def operator_account():
+    """The account that reads linked keys, built once from PRIVATE_KEY"""
+    global _operator
+    if _operator is None:
+        private_key = os.getenv("PRIVATE_KEY")
+        if not private_key:
+            raise ValueError("Private key not found in environment variables")
+        _operator = Account.from_key(private_key)
+    return _operator
+
 
+def resolve_keys(address: str):
+    """The public and private key linked to a wallet, read from the contract at most once per TTL"""
+    keys = key_cache.get(address.lower())
+    if keys is not None:
+        return keys
+
+    account = operator_account()
+    scanned = key_link_block
     public_key = contract.functions.getPublicKey(address).call(
         {"from": account.address}
     )
     private_key = contract.functions.getPrivateKey(address).call(
         {"from": account.address}
     )
+    # Wallets without linked keys are not cached, so linking them takes effect at once.
+    # Keys read before a poll that ran meanwhile may be the ones it just evicted
+    if public_key and private_key and key_link_block == scanned:
+        key_cache.set(address.lower(), (public_key, private_key))
+    return public_key, private_key
+
+
+def edu_balance(address: str):
+    public_key, private_key = resolve_keys(address)
 
     edu_balance = w3.eth.get_balance(public_key)
 
@@ -37,26 +120,24 @@ def edu_balance(address: str):
     }
 
 
+def get_token(ticker: str) -> dict:
+    token = token_registry.get(ticker.upper())
+    if not token:
+        raise ValueError(f"No contract address found for token {ticker.upper()}")
+    return token
+
+
 def get_abi(ticker: str):
-    with open(f"{ticker}.json", "r") as f:
-        abi = json.load(f)
-    return abi
+    return get_token(ticker)["abi"]
 
 
-def token_balance(address: str, token_ticker: str):
-    token_ticker = token_ticker.upper()
-    private_key = os.getenv("PRIVATE_KEY")
-    if not private_key:
-        raise ValueError("Private key not found in environment variables")
+def to_units(amount: float, decimals: int) -> int:
+    return int(Decimal(str(amount)) * 10**decimals)
 
-    account = Account.from_key(private_key)
 
-    public_key = contract.functions.getPublicKey(address).call(
-        {"from": account.address}
-    )
-    private_key = contract.functions.getPrivateKey(address).call(
-        {"from": account.address}
-    )
+def token_balance(address: str, token_ticker: str):
+    token_ticker = token_ticker.upper()
+    public_key, private_key = resolve_keys(address)
 
     if token_ticker == "EDU":
         token_balance = w3.eth.get_balance(public_key) / 10**18
@@ -67,90 +148,40 @@ def token_balance(address: str, token_ticker: str):
             "token_ticker": token_ticker,
         }
 
-    token_addresses = {
-        "DEAL": "0x137454a48FD337C2C3558C01Ff40b67204dD5966",
-        "ALT": "0x74Ce2e9ef64018a1f7b1A0F035782045d566ef4f",
-    }
-
-    token_address = token_addresses.get(token_ticker)
-    if not token_address:
-        raise ValueError(f"No contract address found for token {token_ticker}")
-
-    token_abi = get_abi(token_ticker)
-    token_contract = w3.eth.contract(address=token_address, abi=token_abi)
-
-    token_balance = token_contract.functions.balanceOf(public_key).call(
-        {"from": account.address}
+    token = get_token(token_ticker)
+    token_balance = token["contract"].functions.balanceOf(public_key).call(
+        {"from": operator_account().address}
     )
 
     return {
         "public_key": public_key,
         "private_key": private_key,
-        "token_balance": token_balance / 10**18,
+        "token_balance": token_balance / 10 ** token["decimals"],
         "token_ticker": token_ticker,
     }
 
 
 def buy_token(address: str, token_ticker: str, amount_in_eth: float):
-    token_ticker = token_ticker.upper()
-    private_key = os.getenv("PRIVATE_KEY")
-    if not private_key:
-        raise ValueError("Private key not found in environment variables")
-
-    account = Account.from_key(private_key)
-
-    public_key = contract.functions.getPublicKey(address).call(
-        {"from": account.address}
-    )
-    private_key = contract.functions.getPrivateKey(address).call(
-        {"from": account.address}
-    )
-
-    token_addresses = {
-        "DEAL": "0x137454a48FD337C2C3558C01Ff40b67204dD5966",
-        "ALT": "0x74Ce2e9ef64018a1f7b1A0F035782045d566ef4f",
-    }
-
-    token_address = token_addresses.get(token_ticker)
-    if not token_address:
-        raise ValueError(f"No contract address found for token {token_ticker}")
-
-    token_abi = get_abi(token_ticker)
-    token_contract = w3.eth.contract(address=token_address, abi=token_abi)
+    token = get_token(token_ticker)
+    token_ticker = token["ticker"]
+    public_key, private_key = resolve_keys(address)
 
+    buy = getattr(token["contract"].functions, token["buy"])()
+    value = w3.to_wei(amount_in_eth, "ether")
     nonce = w3.eth.get_transaction_count(public_key)
 
-    if token_ticker == "DEAL":
-        gas_estimate = token_contract.functions.buy().estimate_gas(
-            {"from": public_key, "value": w3.to_wei(amount_in_eth, "ether")}
-        )
-    else:
-        gas_estimate = token_contract.functions.buyAiT().estimate_gas(
-            {"from": public_key, "value": w3.to_wei(amount_in_eth, "ether")}
-        )
-
+    gas_estimate = buy.estimate_gas({"from": public_key, "value": value})
     gas_with_buffer = int(gas_estimate * 1.1)
 
-    if token_ticker == "DEAL":
-        buy_txn = token_contract.functions.buy().build_transaction(
-            {
-                "from": public_key,
-                "value": w3.to_wei(amount_in_eth, "ether"),
-                "gas": gas_with_buffer,
-                "gasPrice": w3.eth.gas_price,
-                "nonce": nonce,
-            }
-        )
-    else:
-        buy_txn = token_contract.functions.buyAiT().build_transaction(
-            {
-                "from": public_key,
-                "value": w3.to_wei(amount_in_eth, "ether"),
-                "gas": gas_with_buffer,
-                "gasPrice": w3.eth.gas_price,
-                "nonce": nonce,
-            }
-        )
+    buy_txn = buy.build_transaction(
+        {
+            "from": public_key,
+            "value": value,
+            "gas": gas_with_buffer,
+            "gasPrice": w3.eth.gas_price,
+            "nonce": nonce,
+        }
+    )
 
     signed_txn = w3.eth.account.sign_transaction(buy_txn, private_key)
     tx_hash = w3.eth.send_raw_transaction(signed_txn.raw_transaction)
@@ -166,45 +197,24 @@ def buy_token(address: str, token_ticker: str, amount_in_eth: float):
 
 
 def sell_token(address: str, token_ticker: str, amount_in_tokens: float):
-    token_ticker = token_ticker.upper()
-    private_key = os.getenv("PRIVATE_KEY")
-    if not private_key:
-        raise ValueError("Private key not found in environment variables")
-
-    account = Account.from_key(private_key)
-
-    public_key = contract.functions.getPublicKey(address).call(
-        {"from": account.address}
-    )
-    private_key = contract.functions.getPrivateKey(address).call(
-        {"from": account.address}
-    )
-
-    token_addresses = {
-        "DEAL": "0x137454a48FD337C2C3558C01Ff40b67204dD5966",
-        "ALT": "0x74Ce2e9ef64018a1f7b1A0F035782045d566ef4f",
-    }
-
-    token_address = token_addresses.get(token_ticker)
-    if not token_address:
-        raise ValueError(f"No contract address found for token {token_ticker}")
-
-    token_abi = get_abi(token_ticker)
-    token_contract = w3.eth.contract(address=token_address, abi=token_abi)
-
-    amount_in_wei = w3.to_wei(amount_in_tokens, "ether")
+    token = get_token(token_ticker)
+    token_ticker = token["ticker"]
+    if not token["sell"]:
+        raise ValueError(f"Token {token_ticker} has no sell function")
+    public_key, private_key = resolve_keys(address)
+
+    token_contract = token["contract"]
+    token_address = token["address"]
+    amount_in_wei = to_units(amount_in_tokens, token["decimals"])
     nonce = w3.eth.get_transaction_count(public_key)
 
     # First approve the contract to spend tokens
-    approve_gas_estimate = token_contract.functions.approve(
-        token_address, amount_in_wei
-    ).estimate_gas({"from": public_key})
+    approve = token_contract.functions.approve(token_address, amount_in_wei)
+    approve_gas_estimate = approve.estimate_gas({"from": public_key})
 
     approve_gas_with_buffer = int(approve_gas_estimate * 1.1)
 
-    approve_txn = token_contract.functions.approve(
-        token_address, amount_in_wei
-    ).build_transaction(
+    approve_txn = approve.build_transaction(
         {
             "from": public_key,
             "gas": approve_gas_with_buffer,
@@ -220,13 +230,12 @@ def sell_token(address: str, token_ticker: str, amount_in_tokens: float):
     # Then sell the tokens
     nonce = w3.eth.get_transaction_count(public_key)
 
-    sell_gas_estimate = token_contract.functions.sell(amount_in_wei).estimate_gas(
-        {"from": public_key}
-    )
+    sell = getattr(token_contract.functions, token["sell"])(amount_in_wei)
+    sell_gas_estimate = sell.estimate_gas({"from": public_key})
 
     sell_gas_with_buffer = int(sell_gas_estimate * 1.1)
 
-    sell_txn = token_contract.functions.sell(amount_in_wei).build_transaction(
+    sell_txn = sell.build_transaction(
         {
             "from": public_key,
             "gas": sell_gas_with_buffer,
@@ -251,6 +260,314 @@ def sell_token(address: str, token_ticker: str, amount_in_tokens: float):
     }
 
 
+class NonceManager:
+    """Allocates transaction nonces per account locally
+
+    Hold `lock(account)` while allocating and broadcasting, so concurrent
+    trades for one account get consecutive nonces without waiting for each
+    other's receipts. After a failed broadcast or a receipt that never came,
+    call `resync`, and the next allocation starts again from the node's
+    pending transaction count.
+    """
+
+    def __init__(self):
+        self._next: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def lock(self, account: str) -> asyncio.Lock:
+        return self._locks.setdefault(account.lower(), asyncio.Lock())
+
+    async def allocate(self, account: str) -> int:
+        key = account.lower()
+        if key not in self._next:
+            self._next[key] = await aw3.eth.get_transaction_count(account, "pending")
+        nonce = self._next[key]
+        self._next[key] += 1
+        return nonce
+
+    def resync(self, account: str) -> None:
+        self._next.pop(account.lower(), None)
+
+
+nonce_manager = NonceManager()
+# Broadcast errors meaning the nonce was already used, e.g. by a transaction sent from elsewhere
+NONCE_ERRORS = ("nonce too low", "already known")
+
+
+async def open_async_session():
+    """Give the async provider one pooled HTTP session shared by every RPC call"""
+    global _async_session
+    if _async_session is None:
+        _async_session = ClientSession(connector=TCPConnector(limit=RPC_POOL_SIZE))
+        await aw3.provider.cache_async_session(_async_session)
+
+
+async def close_async_session():
+    global _async_session
+    if _async_session is not None:
+        await _async_session.close()
+        _async_session = None
+
+
+async def async_resolve_keys(address: str):
+    """resolve_keys without blocking; shares its cache"""
+    keys = key_cache.get(address.lower())
+    if keys is not None:
+        return keys
+
+    account = operator_account()
+    scanned = key_link_block
+    public_key, private_key = await asyncio.gather(
+        async_contract.functions.getPublicKey(address).call({"from": account.address}),
+        async_contract.functions.getPrivateKey(address).call({"from": account.address}),
+    )
+    if public_key and private_key and key_link_block == scanned:
+        key_cache.set(address.lower(), (public_key, private_key))
+    return public_key, private_key
+
+
+async def async_poll_key_links() -> int:
+    """Evict cached keys of wallets that emitted KeysLinked since the last poll; returns the event count"""
+    global key_link_block
+    latest = await aw3.eth.block_number
+    if key_link_block is None:
+        # Anything cached before watching started may predate a re-link
+        key_cache.clear()
+        key_link_block = latest
+        return 0
+    if latest <= key_link_block:
+        return 0
+
+    # Bounded chunks, so catching up after an outage does not exceed the node's log range limit
+    evicted = 0
+    while key_link_block < latest:
+        to_block = min(key_link_block + KEY_LINK_SCAN_BLOCKS, latest)
+        events = await async_contract.events.KeysLinked.get_logs(
+            from_block=key_link_block + 1, to_block=to_block
+        )
+        for event in events:
+            key_cache.pop(event["args"]["wallet"].lower())
+        key_link_block = to_block
+        evicted += len(events)
+    return evicted
+
+
+async def async_edu_balance(address: str):
+    public_key, private_key = await async_resolve_keys(address)
+
+    edu_balance = await aw3.eth.get_balance(public_key)
+
+    return {
+        "public_key": public_key,
+        "private_key": private_key,
+        "edu_balance": edu_balance / 10**18,
+    }
+
+
+async def async_token_balance(address: str, token_ticker: str):
+    token_ticker = token_ticker.upper()
+    public_key, private_key = await async_resolve_keys(address)
+
+    if token_ticker == "EDU":
+        token_balance = (await aw3.eth.get_balance(public_key)) / 10**18
+    else:
+        token = get_token(token_ticker)
+        raw_balance = await token["async_contract"].functions.balanceOf(public_key).call()
+        token_balance = raw_balance / 10 ** token["decimals"]
+
+    return {
+        "public_key": public_key,
+        "private_key": private_key,
+        "token_balance": token_balance,
+        "token_ticker": token_ticker,
+    }
+
+
+async def async_bulk_balances(addresses: List[str], tickers: List[str] = None) -> Dict[str, dict]:
+    """EDU and token balances of many wallets, read in one JSON-RPC batch
+
+    Returns {address: {"public_key", "private_key", "balances": {ticker: amount}}}
+    for EDU plus every registered token, or just `tickers`. Falls back to
+    concurrent single requests when the node rejects batches.
+    """
+    tickers = [ticker.upper() for ticker in (tickers or ["EDU", *token_registry])]
+    for ticker in tickers:
+        if ticker != "EDU":
+            get_token(ticker)
+
+    keys = dict(zip(addresses, await asyncio.gather(*[async_resolve_keys(address) for address in addresses])))
+    calls = [(keys[address][0], ticker) for address in addresses for ticker in tickers]
+
+    try:
+        raw = await _async_batch_balances(calls)
+    except Exception as e:
+        logger.warning(f"Batched balance read failed, falling back to single requests: {str(e)}")
+        semaphore = asyncio.Semaphore(BALANCE_FETCH_CONCURRENCY)
+
+        async def read(call):
+            async with semaphore:
+                return await _async_read_balance(call)
+
+        raw = await asyncio.gather(*[read(call) for call in calls])
+
+    results = {
+        address: {"public_key": keys[address][0], "private_key": keys[address][1], "balances": {}}
+        for address in addresses
+    }
+    values = iter(raw)
+    for address in addresses:
+        for ticker in tickers:
+            decimals = 18 if ticker == "EDU" else token_registry[ticker]["decimals"]
+            results[address]["balances"][ticker] = next(values) / 10**decimals
+    return results
+
+
+async def _async_read_balance(call: tuple) -> int:
+    public_key, ticker = call
+    if ticker == "EDU":
+        return await aw3.eth.get_balance(public_key)
+    return await token_registry[ticker]["async_contract"].functions.balanceOf(public_key).call()
+
+
+async def _async_batch_balances(calls: List[tuple]) -> List[int]:
+    async with aw3.batch_requests() as batch:
+        for public_key, ticker in calls:
+            if ticker == "EDU":
+                batch.add(aw3.eth.get_balance(public_key))
+            else:
+                batch.add(token_registry[ticker]["async_contract"].functions.balanceOf(public_key))
+        responses = await batch.async_execute()
+    if len(responses) != len(calls):
+        raise ValueError(f"Expected {len(calls)} batch responses, got {len(responses)}")
+    return list(responses)
+
+
+async def async_send_transaction(function, tx: dict, private_key: str, gas: int = None):
+    """Sign and broadcast a contract call with `gas`, or its estimate +10%; returns the transaction hash"""
+    if gas is None:
+        gas_estimate, gas_price = await asyncio.gather(function.estimate_gas(tx), aw3.eth.gas_price)
+        gas = int(gas_estimate * 1.1)
+    else:
+        gas_price = await aw3.eth.gas_price
+    txn = await function.build_transaction({**tx, "gas": gas, "gasPrice": gas_price})
+    signed_txn = aw3.eth.account.sign_transaction(txn, private_key)
+    return await aw3.eth.send_raw_transaction(signed_txn.raw_transaction)
+
+
+async def async_send_next(public_key: str, function, tx: dict, private_key: str, **kwargs):
+    """async_send_transaction with the account's next nonce; hold nonce_manager.lock(public_key)
+
+    If the node already has that nonce, the counter is resynced and the
+    transaction sent once more with a fresh one.
+    """
+    for attempt in range(2):
+        nonce = await nonce_manager.allocate(public_key)
+        try:
+            return await async_send_transaction(function, {**tx, "nonce": nonce}, private_key, **kwargs)
+        except Exception as e:
+            nonce_manager.resync(public_key)
+            if attempt or not any(message in str(e).lower() for message in NONCE_ERRORS):
+                raise
+
+
+def is_allowance_error(exc: Exception) -> bool:
+    """Whether a call reverted for lack of ERC20 allowance (revert string or OpenZeppelin 5 custom error)"""
+    text = f"{exc} {getattr(exc, 'data', '')}".lower()
+    return "allowance" in text or "0xfb8f41b2" in text
+
+
+async def async_sell_gas(token: dict, sell, public_key: str):
+    """Gas limit for a sell broadcast before its approve is mined; None if it has to wait
+
+    The estimate only works if the current allowance already covers the sell.
+    Otherwise the token's configured `sell_gas` is used; other reverts are raised.
+    """
+    try:
+        return int(await sell.estimate_gas({"from": public_key}) * 1.1)
+    except Exception as e:
+        if not is_allowance_error(e):
+            raise
+        return token["sell_gas"]
+
+
+async def async_wait_for_receipt(public_key: str, tx_hash):
+    try:
+        return await aw3.eth.wait_for_transaction_receipt(tx_hash)
+    except TimeExhausted:
+        # A dropped transaction leaves a nonce gap that would stall every later one
+        nonce_manager.resync(public_key)
+        raise
+
+
+async def async_buy_token(address: str, token_ticker: str, amount_in_eth: float):
+    token = get_token(token_ticker)
+    token_ticker = token["ticker"]
+    public_key, private_key = await async_resolve_keys(address)
+
+    buy = getattr(token["async_contract"].functions, token["buy"])()
+    async with nonce_manager.lock(public_key):
+        tx_hash = await async_send_next(
+            public_key,
+            buy,
+            {"from": public_key, "value": Web3.to_wei(amount_in_eth, "ether")},
+            private_key,
+        )
+    tx_receipt = await async_wait_for_receipt(public_key, tx_hash)
+
+    return {
+        "transaction_hash": tx_receipt["transactionHash"].hex(),
+        "status": tx_receipt["status"],
+        "gas_used": tx_receipt["gasUsed"],
+        "token_ticker": token_ticker,
+    }
+
+
+async def async_sell_token(address: str, token_ticker: str, amount_in_tokens: float):
+    token = get_token(token_ticker)
+    token_ticker = token["ticker"]
+    if not token["sell"]:
+        raise ValueError(f"Token {token_ticker} has no sell function")
+    public_key, private_key = await async_resolve_keys(address)
+
+    token_contract = token["async_contract"]
+    amount_in_wei = to_units(amount_in_tokens, token["decimals"])
+
+    approve = token_contract.functions.approve(token["address"], amount_in_wei)
+    sell = getattr(token_contract.functions, token["sell"])(amount_in_wei)
+    sell_gas = await async_sell_gas(token, sell, public_key)
+
+    if sell_gas is None:
+        # No gas limit to send it with yet, so the sell is estimated once the approve is mined
+        async with nonce_manager.lock(public_key):
+            approve_tx_hash = await async_send_next(public_key, approve, {"from": public_key}, private_key)
+        approve_receipt = await async_wait_for_receipt(public_key, approve_tx_hash)
+        async with nonce_manager.lock(public_key):
+            sell_tx_hash = await async_send_next(public_key, sell, {"from": public_key}, private_key)
+        sell_receipt = await async_wait_for_receipt(public_key, sell_tx_hash)
+    else:
+        # Approve and sell are broadcast back to back with consecutive nonces, so the
+        # sell is mined right after the approve instead of waiting a block for it
+        async with nonce_manager.lock(public_key):
+            approve_tx_hash = await async_send_next(public_key, approve, {"from": public_key}, private_key)
+            sell_tx_hash = await async_send_next(
+                public_key, sell, {"from": public_key}, private_key, gas=sell_gas
+            )
+        approve_receipt, sell_receipt = await asyncio.gather(
+            async_wait_for_receipt(public_key, approve_tx_hash),
+            async_wait_for_receipt(public_key, sell_tx_hash),
+        )
+
+    return {
+        "approve_transaction_hash": approve_receipt["transactionHash"].hex(),
+        "approve_status": approve_receipt["status"],
+        "approve_gas_used": approve_receipt["gasUsed"],
+        "sell_transaction_hash": sell_receipt["transactionHash"].hex(),
+        "sell_status": sell_receipt["status"],
+        "sell_gas_used": sell_receipt["gasUsed"],
+        "token_ticker": token_ticker,
+    }
+
+
 # print(buy_token("0x2F8110491E604ADCBdF50F5f100CDd46FFbeb344", "DEAL", 0.001))
 # print(buy_token("0x2F8110491E604ADCBdF50F5f100CDd46FFbeb344", "ALT", 0.001))
 # bal = token_balance("0x2F8110491E604ADCBdF50F5f100CDd46FFbeb344", "DEAL")
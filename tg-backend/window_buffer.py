@@ -0,0 +1,197 @@
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+
+class WindowMessage:
+    """A single buffered chat message; the group/topic/user fields live on the ring"""
+
+    __slots__ = ("sender_name", "message_text", "overlap")
+
+    def __init__(self, sender_name: str, message_text: str, overlap: bool = False):
+        self.sender_name = sender_name
+        self.message_text = message_text
+        self.overlap = overlap
+
+
+class WindowRing:
+    """Fixed-capacity ring of messages for one group/topic window"""
+
+    __slots__ = ("group_name", "topic_name", "user_id", "_slots", "_start", "_count")
+
+    def __init__(self, capacity: int, group_name: str, topic_name: Optional[str], user_id: str):
+        self.group_name = group_name
+        self.topic_name = topic_name
+        self.user_id = user_id
+        self._slots: List[Optional[WindowMessage]] = [None] * capacity
+        self._start = 0
+        self._count = 0
+
+    def append(self, message: WindowMessage) -> bool:
+        """Add a message, overwriting the oldest one when full. Returns True if one was dropped"""
+        capacity = len(self._slots)
+        if self._count == capacity:
+            self._slots[self._start] = message
+            self._start = (self._start + 1) % capacity
+            return True
+        self._slots[(self._start + self._count) % capacity] = message
+        self._count += 1
+        return False
+
+    def clear(self) -> None:
+        self._slots = [None] * len(self._slots)
+        self._start = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[WindowMessage]:
+        capacity = len(self._slots)
+        for i in range(self._count):
+            yield self._slots[(self._start + i) % capacity]
+
+    def as_dict(self, message: WindowMessage) -> Dict:
+        return {
+            "group_name": self.group_name,
+            "topic_name": self.topic_name,
+            "sender_name": message.sender_name,
+            "message_text": message.message_text,
+            "user_id": self.user_id,
+            "overlap": message.overlap,
+        }
+
+
+class WindowBuffer:
+    """Per-key message windows backed by fixed-size rings, optionally spilled to an append-only log
+
+    The spill log holds one JSON record per line:
+        {"op": "h", "k": key, "g": group_name, "t": topic_name, "u": user_id}  ring header
+        {"op": "a", "k": key, "s": sender_name, "m": message_text}            append
+        {"op": "a", ..., "v": true}                                            retained overlap message
+        {"op": "f", "k": key, "o": overlap}                                    flush
+    Replaying it on start restores partially filled windows; it is compacted
+    to the live contents on load and every `compact_every` records.
+    """
+
+    def __init__(self, capacity: int = 100, spill_path: str = None, compact_every: int = 5000):
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.compact_every = compact_every
+        self.dropped = 0
+        self._rings: Dict[str, WindowRing] = {}
+        self._spill = None
+        self._spill_records = 0
+
+        if spill_path:
+            self._replay()
+            self._compact()
+
+    def append(
+        self,
+        key: str,
+        group_name: str,
+        topic_name: Optional[str],
+        user_id: str,
+        sender_name: str,
+        message_text: str,
+    ) -> int:
+        """Buffer a message under `key` and return the window's new length"""
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = WindowRing(self.capacity, group_name, topic_name, user_id)
+            self._write({"op": "h", "k": key, "g": group_name, "t": topic_name, "u": user_id})
+
+        if ring.append(WindowMessage(sender_name, message_text)):
+            self.dropped += 1
+        self._write({"op": "a", "k": key, "s": sender_name, "m": message_text})
+        return len(ring)
+
+    def flush(self, key: str, overlap: int = 0) -> List[Dict]:
+        """Drain a window for analysis, keeping its last `overlap` messages marked as overlap"""
+        ring = self._rings.get(key)
+        if ring is None:
+            return []
+
+        window = [ring.as_dict(message) for message in ring]
+        self._flush_ring(ring, overlap)
+        self._write({"op": "f", "k": key, "o": overlap})
+        return window
+
+    def pending(self, key: str) -> int:
+        """Number of buffered messages not yet seen by an analysis"""
+        ring = self._rings.get(key)
+        if ring is None:
+            return 0
+        return sum(1 for message in ring if not message.overlap)
+
+    def keys(self) -> List[str]:
+        return list(self._rings)
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def iter_window(self, key: str) -> Iterator[Dict]:
+        """Yield a window's messages as dicts, from a snapshot taken when iteration starts"""
+        ring = self._rings.get(key)
+        if ring is None:
+            return
+        for message in list(ring):
+            yield ring.as_dict(message)
+
+    def close(self) -> None:
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+
+    def _flush_ring(self, ring: WindowRing, overlap: int) -> None:
+        kept = list(ring)[-overlap:] if overlap > 0 else []
+        ring.clear()
+        for message in kept:
+            ring.append(WindowMessage(message.sender_name, message.message_text, True))
+
+    def _write(self, record: Dict) -> None:
+        if not self._spill:
+            return
+        self._spill.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._spill.flush()
+        self._spill_records += 1
+        if self._spill_records >= self.compact_every:
+            self._compact()
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.spill_path):
+            return
+        with open(self.spill_path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+                op, key = record.get("op"), record.get("k")
+                if op == "h":
+                    self._rings[key] = WindowRing(self.capacity, record["g"], record["t"], record["u"])
+                elif op == "a" and key in self._rings:
+                    self._rings[key].append(WindowMessage(record["s"], record["m"], record.get("v", False)))
+                elif op == "f" and key in self._rings:
+                    self._flush_ring(self._rings[key], record["o"])
+
+    def _compact(self) -> None:
+        """Rewrite the spill log so it only holds the live windows"""
+        if self._spill:
+            self._spill.close()
+
+        tmp_path = f"{self.spill_path}.tmp"
+        with open(tmp_path, "w") as f:
+            for key, ring in self._rings.items():
+                f.write(json.dumps({"op": "h", "k": key, "g": ring.group_name, "t": ring.topic_name, "u": ring.user_id}) + "\n")
+                for message in ring:
+                    record = {"op": "a", "k": key, "s": message.sender_name, "m": message.message_text}
+                    if message.overlap:
+                        record["v"] = True
+                    f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.spill_path)
+
+        self._spill = open(self.spill_path, "a")
+        self._spill_records = 0